@@ -0,0 +1,473 @@
+import csv
+import io
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import get_context
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+import degrees
+import parallel
+import service
+import snapshot
+from graph import Graph, peak_rss
+from landmarks import LandmarkIndex
+from util import Node, StackFrontier, QueueFrontier
+
+PEOPLE = 50000
+MOVIES = 15000
+CAST = 8
+QUERIES = 50
+CLIENTS = 8
+FRONTIER_NODES = 2000000
+
+
+def main():
+    if len(sys.argv) > 3:
+        sys.exit("Usage: python benchmark.py [people] [movies]")
+    n_people = int(sys.argv[1]) if len(sys.argv) > 1 else PEOPLE
+    n_movies = int(sys.argv[2]) if len(sys.argv) > 2 else MOVIES
+
+    print(f"Generating {n_people} people, {n_movies} movies...")
+    generate(n_people, n_movies, CAST)
+    pairs = sample_pairs(QUERIES)
+
+    bench_frontiers(FRONTIER_NODES)
+    bench_layouts()
+    bench_search(pairs)
+    bench_snapshot()
+    bench_service(pairs)
+    bench_parallel(sample_pairs(QUERIES * 8, seed=2))
+    bench_distances()
+    bench_landmarks(pairs)
+    bench_neighbor_cache(pairs)
+    bench_ingestion()
+
+
+def generate(n_people, n_movies, cast, seed=0):
+    """
+    Fill `degrees.people`, `degrees.movies` and `degrees.names` with a
+    random dataset of `n_people` people and `n_movies` movies of
+    `cast` stars each, in the same layout as `degrees.load_data`.
+    """
+    rng = random.Random(seed)
+    degrees.people.clear()
+    degrees.movies.clear()
+    degrees.names.clear()
+    degrees.graph = None
+    for i in range(n_people):
+        person_id = str(i)
+        name = f"Person {i}"
+        degrees.people[person_id] = {
+            "name": name, "birth": "1970", "movies": set()
+        }
+        degrees.names[name.lower()] = {person_id}
+    for i in range(n_movies):
+        movie_id = str(i)
+        degrees.movies[movie_id] = {
+            "title": f"Movie {i}", "year": "2000", "stars": set()
+        }
+        for _ in range(cast):
+            person_id = str(rng.randrange(n_people))
+            degrees.people[person_id]["movies"].add(movie_id)
+            degrees.movies[movie_id]["stars"].add(person_id)
+
+
+def sample_pairs(n, seed=1):
+    """
+    Returns `n` random (source, target) person id pairs.
+    """
+    rng = random.Random(seed)
+    ids = list(degrees.people)
+    return [(rng.choice(ids), rng.choice(ids)) for _ in range(n)]
+
+
+class ListStackFrontier():
+    """
+    The original list-backed frontier, kept for comparison.
+    """
+
+    def __init__(self):
+        self.frontier = []
+
+    def add(self, node):
+        self.frontier.append(node)
+
+    def contains_state(self, state):
+        return any(node.state == state for node in self.frontier)
+
+    def empty(self):
+        return len(self.frontier) == 0
+
+    def remove(self):
+        node = self.frontier[-1]
+        self.frontier = self.frontier[:-1]
+        return node
+
+
+class ListQueueFrontier(ListStackFrontier):
+
+    def remove(self):
+        node = self.frontier[0]
+        self.frontier = self.frontier[1:]
+        return node
+
+
+def churn(frontier, n):
+    """
+    Push `n` nodes through `frontier`, checking membership on each add
+    the way `shortest_path` does, and return nodes per second.
+    """
+    start = time.perf_counter()
+    for i in range(n):
+        frontier.contains_state(i)
+        frontier.add(Node(state=i, parent=None, action=None))
+        if i % 2:
+            frontier.remove()
+    while not frontier.empty():
+        frontier.remove()
+    return n / (time.perf_counter() - start)
+
+
+def bench_frontiers(n):
+    # The list-backed frontiers are quadratic, so give them fewer nodes
+    legacy = min(n, 20000)
+    print("Frontier (nodes/sec)")
+    for label, frontier, count in (
+        ("list stack", ListStackFrontier, legacy),
+        ("list queue", ListQueueFrontier, legacy),
+        ("deque stack", StackFrontier, n),
+        ("deque queue", QueueFrontier, n),
+    ):
+        rate = churn(frontier(), count)
+        print(f"  {label:<16} {rate:12.0f} ({count} nodes)")
+
+
+def deep_size(people, movies):
+    """
+    Returns the traced size in bytes of a deep copy of the dict layout.
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    copy = (
+        {
+            key: {"name": value["name"], "birth": value["birth"],
+                  "movies": set(value["movies"])}
+            for key, value in people.items()
+        },
+        {
+            key: {"title": value["title"], "year": value["year"],
+                  "stars": set(value["stars"])}
+            for key, value in movies.items()
+        },
+    )
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del copy
+    return size
+
+
+def graph_size():
+    """
+    Returns the traced size in bytes of a freshly built `Graph`.
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    graph = Graph.from_data(degrees.people, degrees.movies)
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del graph
+    return size
+
+
+def bench_layouts():
+    print("Memory")
+    dicts = deep_size(degrees.people, degrees.movies)
+    compact = graph_size()
+    print(f"  dicts of sets: {dicts / 2**20:8.1f} MiB")
+    print(f"  CSR graph:     {compact / 2**20:8.1f} MiB "
+          f"({dicts / compact:.1f}x smaller)")
+
+
+def timed(label, search, pairs):
+    """
+    Run `search` over every pair and print queries per second.
+    Returns the list of path lengths.
+    """
+    start = time.perf_counter()
+    lengths = []
+    for source, target in pairs:
+        path = search(source, target)
+        lengths.append(None if path is None else len(path))
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<16} {len(pairs) / elapsed:10.1f} queries/sec")
+    return lengths
+
+
+def bench_search(pairs):
+    print(f"Search ({len(pairs)} queries)")
+    degrees.graph = None
+    baseline = timed("dicts of sets", degrees.shortest_path, pairs)
+    degrees.build_graph()
+    compact = timed("CSR graph", degrees.shortest_path, pairs)
+    if baseline != compact:
+        sys.exit("Path lengths differ between layouts.")
+    bench_bidirectional(pairs)
+
+
+def bench_bidirectional(pairs):
+    """
+    Compare people expanded by plain and bidirectional BFS on the
+    longest of `pairs`.
+    """
+    graph = degrees.graph
+    lengths = {}
+    for source, target in pairs:
+        path = graph.shortest_path(source, target)
+        if path is not None:
+            lengths[(source, target)] = len(path)
+    longest = sorted(lengths, key=lengths.get, reverse=True)
+    longest = longest[:max(1, len(longest) // 4)]
+
+    print(f"Bidirectional ({len(longest)} longest connected queries)")
+    totals = {}
+    for strategy in ("bfs", "bidirectional"):
+        totals[strategy] = 0
+        for source, target in longest:
+            path = graph.shortest_path(source, target, strategy)
+            if len(path) != lengths[(source, target)]:
+                sys.exit("Bidirectional path length differs from BFS.")
+            totals[strategy] += graph.expanded
+        print(f"  {strategy:<16} {totals[strategy] / len(longest):10.1f} "
+              "people expanded/query")
+    timed("bidirectional", lambda s, t: degrees.shortest_path(
+        s, t, "bidirectional"), pairs)
+
+
+def write_csv(directory):
+    """
+    Write the generated dataset to `directory` in the CSV layout
+    `degrees.load_data` reads.
+    """
+    with open(os.path.join(directory, "people.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for person_id, person in degrees.people.items():
+            writer.writerow([person_id, person["name"], person["birth"]])
+    with open(os.path.join(directory, "movies.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "title", "year"])
+        for movie_id, movie in degrees.movies.items():
+            writer.writerow([movie_id, movie["title"], movie["year"]])
+    with open(os.path.join(directory, "stars.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        for person_id, person in degrees.people.items():
+            for movie_id in person["movies"]:
+                writer.writerow([person_id, movie_id])
+
+
+def bench_snapshot():
+    print("Startup")
+    with tempfile.TemporaryDirectory() as directory:
+        write_csv(directory)
+
+        degrees.people.clear()
+        degrees.movies.clear()
+        degrees.names.clear()
+        start = time.perf_counter()
+        degrees.load_data(directory)
+        degrees.build_graph()
+        parsed = time.perf_counter() - start
+        print(f"  CSV load:       {parsed * 1000:10.1f} ms")
+
+        start = time.perf_counter()
+        snapshot.save(degrees.graph, directory)
+        print(f"  build-index:    {(time.perf_counter() - start) * 1000:10.1f} ms")
+
+        start = time.perf_counter()
+        graph = snapshot.load(directory)
+        mapped = time.perf_counter() - start
+        print(f"  snapshot load:  {mapped * 1000:10.1f} ms")
+
+        source, target = sample_pairs(1)[0]
+        if (graph.shortest_path(source, target)
+                != degrees.graph.shortest_path(source, target)):
+            sys.exit("Snapshot search differs from CSV search.")
+        del graph
+
+
+def bench_service(pairs):
+    print(f"Service ({len(pairs)} queries)")
+    degrees.build_graph()
+    lines = [
+        f"{degrees.people[source]['name']}\t{degrees.people[target]['name']}\n"
+        for source, target in pairs
+    ]
+    start = time.perf_counter()
+    service.run_batch(lines, io.StringIO())
+    elapsed = time.perf_counter() - start
+    print(f"  {'batch':<16} {len(pairs) / elapsed:10.1f} queries/sec")
+
+    server = service.make_server(port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://{service.HOST}:{server.server_address[1]}/path?"
+
+    def fetch(line):
+        source, target = line.rstrip("\n").split("\t")
+        with urlopen(url + urlencode({"source": source, "target": target})) as f:
+            return f.read()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(CLIENTS) as pool:
+        list(pool.map(fetch, lines))
+    elapsed = time.perf_counter() - start
+    print(f"  {f'http x{CLIENTS}':<16} {len(pairs) / elapsed:10.1f} queries/sec")
+    server.shutdown()
+    server.server_close()
+
+
+def bench_parallel(pairs):
+    print(f"Process pool ({len(pairs)} queries, {os.cpu_count()} cores)")
+    with tempfile.TemporaryDirectory() as directory:
+        write_csv(directory)
+        snapshot.save(degrees.build_graph(), directory)
+        expected = [
+            degrees.graph.shortest_path(source, target, "bidirectional")
+            for source, target in pairs
+        ]
+        processes = 1
+        while processes <= os.cpu_count():
+            start = time.perf_counter()
+            paths = parallel.shortest_paths(directory, pairs, processes)
+            elapsed = time.perf_counter() - start
+            if paths != expected:
+                sys.exit("Parallel paths differ from serial paths.")
+            print(f"  {f'{processes} processes':<16} "
+                  f"{len(pairs) / elapsed:10.1f} queries/sec")
+            processes *= 2
+
+
+def bench_distances():
+    graph = degrees.build_graph()
+    targets = range(min(graph.person_count(), QUERIES))
+    print(f"Single source (vs {len(targets)} per-target searches)")
+
+    start = time.perf_counter()
+    for target in targets:
+        graph.search(0, target)
+    print(f"  {'per-target':<16} {(time.perf_counter() - start) * 1000:10.1f} ms")
+
+    start = time.perf_counter()
+    graph.distances(0)
+    print(f"  {'distances':<16} {(time.perf_counter() - start) * 1000:10.1f} ms")
+
+    start = time.perf_counter()
+    histogram = graph.separation_histogram(10, seed=0)
+    print(f"  {'histogram x10':<16} {(time.perf_counter() - start) * 1000:10.1f} ms")
+    total = sum(histogram.values())
+    for distance in sorted(histogram, key=lambda d: (d is None, d)):
+        label = "unreachable" if distance is None else distance
+        print(f"    {label:>11}: {histogram[distance] / total:6.1%}")
+
+
+def bench_landmarks(pairs):
+    graph = degrees.build_graph()
+    print(f"Landmarks ({len(pairs)} queries)")
+    start = time.perf_counter()
+    graph.landmarks = LandmarkIndex.build(graph)
+    print(f"  {'build':<16} {(time.perf_counter() - start) * 1000:10.1f} ms "
+          f"({len(graph.landmarks.landmarks)} landmarks)")
+
+    indexes = [
+        (graph.person_index[source], graph.person_index[target])
+        for source, target in pairs
+    ]
+    start = time.perf_counter()
+    for source, target in indexes:
+        graph.landmarks.bounds(source, target)
+    elapsed = time.perf_counter() - start
+    print(f"  {'bounds':<16} {elapsed / len(pairs) * 1e6:10.1f} us/query")
+
+    expected = None
+    for strategy in ("bfs", "bidirectional", "landmarks"):
+        expanded = 0
+        lengths = []
+        start = time.perf_counter()
+        for source, target in pairs:
+            path = graph.shortest_path(source, target, strategy)
+            lengths.append(None if path is None else len(path))
+            expanded += graph.expanded
+        elapsed = time.perf_counter() - start
+        if expected is None:
+            expected = lengths
+        elif lengths != expected:
+            sys.exit(f"{strategy} path lengths differ from BFS.")
+        print(f"  {strategy:<16} {elapsed / len(pairs) * 1000:10.2f} ms/query, "
+              f"{expanded / len(pairs):8.1f} people expanded/query")
+
+
+def bench_neighbor_cache(pairs):
+    print(f"Neighbor cache (dict layout, {len(pairs)} queries)")
+    degrees.graph = None
+    for budget in (None, 2**20, 16 * 2**20, 256 * 2**20):
+        if budget is None:
+            degrees.neighbor_cache = None
+            label = "no cache"
+        else:
+            degrees.enable_neighbor_cache(budget)
+            label = f"{budget // 2**20} MiB"
+        start = time.perf_counter()
+        for source, target in pairs:
+            degrees.shortest_path(source, target)
+        rate = len(pairs) / (time.perf_counter() - start)
+        line = f"  {label:<16} {rate:10.1f} queries/sec"
+        if degrees.neighbor_cache is not None:
+            stats = degrees.neighbor_cache.stats()
+            line += (f", hit rate {stats['hit_rate']:6.1%}, "
+                     f"{stats['evictions']} evictions")
+        print(line)
+    degrees.neighbor_cache = None
+
+
+def ingest(loader, directory):
+    """
+    Load `directory` with one of the ingestion paths and return
+    (rows/sec, peak RSS in bytes). Run in a fresh process so each
+    loader's peak RSS is measured on its own.
+    """
+    start = time.perf_counter()
+    if loader == "DictReader":
+        degrees.load_data(directory)
+        degrees.build_graph()
+    else:
+        Graph.from_csv(directory, metadata=(loader == "streaming"))
+    elapsed = time.perf_counter() - start
+    rows = 0
+    for source in snapshot.SOURCES:
+        with open(os.path.join(directory, source)) as f:
+            rows += sum(1 for _ in f) - 1
+    return rows / elapsed, peak_rss()
+
+
+def bench_ingestion():
+    print("Ingestion (fresh process each)")
+    context = get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        write_csv(directory)
+        for loader in ("DictReader", "streaming", "streaming, no meta"):
+            with context.Pool(1) as pool:
+                rate, peak = pool.apply(ingest, (loader, directory))
+            print(f"  {loader:<18} {rate:10.0f} rows/sec, "
+                  f"peak RSS {peak / 2**20:7.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
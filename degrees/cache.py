@@ -0,0 +1,77 @@
+import sys
+from collections import OrderedDict
+
+# Default memory budget for cached neighbor sets, in bytes
+BUDGET = 64 * 2**20
+
+# Approximate cost of one (movie_id, person_id) tuple in a cached set;
+# the id strings themselves are shared with the loaded data
+PAIR_SIZE = sys.getsizeof((None, None))
+
+
+class NeighborCache():
+    """
+    Least-recently-used cache of each person's (movie_id, person_id)
+    neighbor set, bounded by an approximate memory budget in bytes.
+    """
+
+    def __init__(self, budget=BUDGET):
+        self.budget = budget
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, person_id):
+        """
+        Returns the cached neighbors of `person_id`, or None.
+        """
+        neighbors = self.entries.get(person_id)
+        if neighbors is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(person_id)
+        return neighbors
+
+    def put(self, person_id, neighbors):
+        """
+        Cache `neighbors` for `person_id`, evicting the least recently
+        used entries until the cache fits its budget. Sets larger than
+        the whole budget are not cached.
+        """
+        cost = _sizeof(neighbors)
+        if cost > self.budget:
+            return
+        if person_id in self.entries:
+            self.size -= _sizeof(self.entries.pop(person_id))
+        self.entries[person_id] = neighbors
+        self.size += cost
+        while self.size > self.budget:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= _sizeof(evicted)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+    def stats(self):
+        """
+        Returns a dictionary of hit/miss counters and current usage.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "size": self.size,
+            "budget": self.budget,
+        }
+
+
+def _sizeof(neighbors):
+    return sys.getsizeof(neighbors) + len(neighbors) * PAIR_SIZE
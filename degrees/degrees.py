@@ -1,6 +1,10 @@
 import csv
 import sys
 
+import snapshot
+from cache import NeighborCache
+from graph import Graph
+from landmarks import LandmarkIndex
 from util import Node, StackFrontier, QueueFrontier
 
 # Maps names to a set of corresponding person_ids
@@ -12,11 +16,24 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Compact integer-indexed copy of people and movies, once built
+graph = None
+
+# Optional NeighborCache used by neighbors_for_person, which only the
+# dictionary-layout BFS calls
+neighbor_cache = None
+
+# Search strategies accepted by shortest_path
+STRATEGIES = ("bfs", "bidirectional", "landmarks")
+
 
 def load_data(directory):
     """
     Load data from CSV files into memory.
     """
+    # Searches must use the new dictionaries, not an older graph
+    _use_graph(None)
+
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
@@ -52,14 +69,124 @@ def load_data(directory):
                 pass
 
 
+def build_graph():
+    """
+    Build the compact graph from the loaded data and use it for searches.
+    """
+    return _use_graph(Graph.from_data(people, movies))
+
+
+def load_snapshot(directory):
+    """
+    Memory-map the binary snapshot for `directory`, if there is an
+    up-to-date one, and use it for searches.
+    Returns True if the snapshot was loaded.
+    """
+    loaded = snapshot.load(directory)
+    if loaded is not None:
+        _use_graph(loaded)
+    return loaded is not None
+
+
+def load(directory):
+    """
+    Map the snapshot for `directory` if it is up to date,
+    otherwise stream the CSV files into a graph.
+    """
+    if not load_snapshot(directory):
+        _use_graph(Graph.from_csv(directory))
+    return graph
+
+
+def build_index(directory):
+    """
+    Parse the CSV files in `directory` and write a binary snapshot
+    that later runs can load with `load_snapshot`.
+    """
+    _use_graph(Graph.from_csv(directory))
+    return snapshot.save(graph, directory)
+
+
+def _use_graph(new):
+    """
+    Make `new` the graph used for searches, dropping neighbor sets
+    cached from the previous data.
+    """
+    global graph
+    graph = new
+    if neighbor_cache is not None:
+        neighbor_cache.clear()
+    return graph
+
+
+def build_landmarks(directory, count=None):
+    """
+    Build a landmark index for the data in `directory`, write it next
+    to the CSV files and attach it to the graph.
+    """
+    load(directory)
+    if count is None:
+        graph.landmarks = LandmarkIndex.build(graph)
+    else:
+        graph.landmarks = LandmarkIndex.build(graph, count)
+    return graph.landmarks.save(directory)
+
+
+def load_landmarks(directory):
+    """
+    Attach the landmark index for `directory` to the loaded graph, if
+    there is an up-to-date one. Returns True if it was loaded.
+    """
+    graph.landmarks = LandmarkIndex.load(graph, directory)
+    return graph.landmarks is not None
+
+
+def separation_bounds(source, target):
+    """
+    Returns (lower, upper) bounds on the degrees of separation between
+    two people from the landmark index, without searching, or None if
+    the index shows they are not connected.
+    """
+    return graph.landmarks.bounds(
+        graph.person_index[source], graph.person_index[target])
+
+
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    if len(sys.argv) > 1 and sys.argv[1] == "build-index":
+        if len(sys.argv) > 3:
+            sys.exit("Usage: python degrees.py build-index [directory]")
+        directory = sys.argv[2] if len(sys.argv) == 3 else "large"
+        print("Building index...")
+        path = build_index(directory)
+        stats = graph.load_stats
+        print(f"Read {stats['rows']} rows at {stats['rows_per_sec']:.0f} rows/sec, "
+              f"peak RSS {stats['peak_rss'] / 2**20:.1f} MiB.")
+        print(f"Index written to {path}.")
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "build-landmarks":
+        if len(sys.argv) > 4:
+            sys.exit("Usage: python degrees.py build-landmarks [directory] [count]")
+        directory = sys.argv[2] if len(sys.argv) >= 3 else "large"
+        count = int(sys.argv[3]) if len(sys.argv) == 4 else None
+        print("Building landmarks...")
+        path = build_landmarks(directory, count)
+        print(f"Landmarks written to {path}.")
+        return
+    if len(sys.argv) > 1 and sys.argv[1] in ("batch", "serve"):
+        import service
+        service.main(sys.argv[1:])
+        return
+
+    if len(sys.argv) > 3 or (len(sys.argv) == 3 and sys.argv[2] not in STRATEGIES):
+        sys.exit("Usage: python degrees.py [directory] [bfs|bidirectional|landmarks]")
+    directory = sys.argv[1] if len(sys.argv) >= 2 else "large"
+    strategy = sys.argv[2] if len(sys.argv) == 3 else "bidirectional"
 
-    # Load data from files into memory
+    # Load data from files into memory, or map a prebuilt snapshot
     print("Loading data...")
-    load_data(directory)
+    load(directory)
+    if strategy == "landmarks" and not load_landmarks(directory):
+        sys.exit("No landmarks; run: python degrees.py build-landmarks")
     print("Data loaded.")
 
     source = person_id_for_name(input("Name: "))
@@ -69,7 +196,7 @@ def main():
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    path = shortest_path(source, target, strategy)
 
     if path is None:
         print("Not connected.")
@@ -78,21 +205,28 @@ def main():
         print(f"{degrees} degrees of separation.")
         path = [(None, source)] + path
         for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
+            person1 = person_details(path[i][1])["name"]
+            person2 = person_details(path[i + 1][1])["name"]
+            movie = movie_details(path[i + 1][0])["title"]
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def shortest_path(source, target, strategy="bfs"):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
+    `strategy` selects the search used on the compact graph; any
+    strategy other than plain "bfs" builds the graph if needed.
+
     If no possible path, returns None.
     """
-    
-     # Initialize frontier to the starting actor
+    if graph is None and strategy != "bfs":
+        build_graph()
+    if graph is not None:
+        return graph.shortest_path(source, target, strategy)
+
+    # Initialize frontier to the starting actor
     start = Node(state=source, parent=None, action=None)
     frontier = QueueFrontier()
     frontier.add(start)
@@ -117,14 +251,36 @@ def shortest_path(source, target):
         # Add the node to the explored set
         explored.add(node.state)
 
-    for neighbor in neighbors_for_person(node.state):
-        movie_id = neighbor[0]
-        person_id = neighbor[1]
-        if not frontier.contains_state(person_id) and person_id not in explored:
-            child = Node(state=person_id, parent=node, action=movie_id)
-            frontier.add(child)
+        for neighbor in neighbors_for_person(node.state):
+            movie_id = neighbor[0]
+            person_id = neighbor[1]
+            if not frontier.contains_state(person_id) and person_id not in explored:
+                child = Node(state=person_id, parent=node, action=movie_id)
+                frontier.add(child)
+
+    return None
+
+
+def distances_from(source):
+    """
+    Returns (depth, parent, via) arrays from a single breadth-first
+    search out of person `source`, indexed by `graph` person index.
+    Builds the compact graph if needed.
+    """
+    if graph is None:
+        build_graph()
+    return graph.distances(graph.person_index[source])
+
 
-   
+def separation_histogram(samples=100, seed=None):
+    """
+    Returns a Counter of degrees of separation over (source, target)
+    pairs, searching once from each of `samples` random sources.
+    Builds the compact graph if needed.
+    """
+    if graph is None:
+        build_graph()
+    return graph.separation_histogram(samples, seed)
 
 
 def person_id_for_name(name):
@@ -132,13 +288,13 @@ def person_id_for_name(name):
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
     """
-    person_ids = list(names.get(name.lower(), set()))
+    person_ids = person_ids_for_name(name)
     if len(person_ids) == 0:
         return None
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
         for person_id in person_ids:
-            person = people[person_id]
+            person = person_details(person_id)
             name = person["name"]
             birth = person["birth"]
             print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
@@ -153,11 +309,88 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
+def person_ids_for_name(name):
+    """
+    Returns the list of IMDB ids for every person with a given name.
+    """
+    if graph is not None:
+        return [
+            graph.person_ids[person]
+            for person in graph.names.get(name.lower(), [])
+        ]
+    return list(names.get(name.lower(), set()))
+
+
+def person_details(person_id):
+    """
+    Returns a dictionary with the name and birth year of a person.
+    """
+    if person_id in people:
+        return people[person_id]
+    person = graph.person_index[person_id]
+    return {
+        "name": graph.person_names[person],
+        "birth": graph.person_births[person],
+    }
+
+
+def movie_details(movie_id):
+    """
+    Returns a dictionary with the title and year of a movie.
+    """
+    if movie_id in movies:
+        return movies[movie_id]
+    movie = graph.movie_index[movie_id]
+    return {
+        "title": graph.movie_titles[movie],
+        "year": graph.movie_years[movie],
+    }
+
+
+def enable_neighbor_cache(budget=None):
+    """
+    Memoize `neighbors_for_person` in an LRU cache holding at most
+    about `budget` bytes of neighbor sets. Returns the cache, whose
+    `stats()` report hits, misses and evictions.
+
+    Only the dictionary BFS, which `shortest_path` runs for "bfs" when
+    no compact graph is loaded, calls `neighbors_for_person`; searches
+    on the compact graph (every other strategy, `main`, `service` and
+    `parallel`) read its arrays directly and never use the cache. It also only pays off when the
+    budget holds the people the queries keep revisiting: a smaller
+    budget evicts constantly and is slower than no cache at all.
+    """
+    global neighbor_cache
+    if budget is None:
+        neighbor_cache = NeighborCache()
+    else:
+        neighbor_cache = NeighborCache(budget)
+    return neighbor_cache
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
+
+    With the neighbor cache enabled the result is a shared frozenset.
     """
+    if neighbor_cache is not None:
+        neighbors = neighbor_cache.get(person_id)
+        if neighbors is None:
+            neighbors = frozenset(_neighbors_for_person(person_id))
+            neighbor_cache.put(person_id, neighbors)
+        return neighbors
+    return _neighbors_for_person(person_id)
+
+
+def _neighbors_for_person(person_id):
+    if graph is not None:
+        return {
+            (graph.movie_ids[movie], graph.person_ids[person])
+            for movie, person in graph.neighbors(graph.person_index[person_id])
+        }
+
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
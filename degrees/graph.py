@@ -0,0 +1,547 @@
+import csv
+import os
+import random
+import resource
+import sys
+import time
+from array import array
+from collections import Counter, deque
+
+
+class Graph():
+    """
+    Compact person-movie graph.
+
+    IMDb ids are interned to dense integers (people and movies are
+    numbered separately, in load order), and the bipartite graph is held
+    as two CSR adjacency lists:
+
+        person_movies[person_offsets[p]:person_offsets[p + 1]]
+            are the movies person `p` starred in
+        movie_stars[movie_offsets[m]:movie_offsets[m + 1]]
+            are the people who starred in movie `m`
+
+    All four are flat `array("i")` buffers, so the whole graph costs a
+    few bytes per edge instead of a Python set entry per edge.
+    """
+
+    def __init__(self):
+        # Interned ids: index -> IMDb id, and IMDb id -> index
+        self.person_ids = []
+        self.movie_ids = []
+        self.person_index = {}
+        self.movie_index = {}
+
+        # Metadata, indexed by interned id
+        self.person_names = []
+        self.person_births = []
+        self.movie_titles = []
+        self.movie_years = []
+
+        # Maps lowercased names to a list of person indexes
+        self.names = {}
+
+        # CSR adjacency
+        self.person_offsets = array("i", [0])
+        self.person_movies = array("i")
+        self.movie_offsets = array("i", [0])
+        self.movie_stars = array("i")
+
+        # Number of people expanded by the most recent search
+        self.expanded = 0
+
+        # Memory map backing the arrays, when loaded from a snapshot
+        self.snapshot = None
+
+        # Optional landmarks.LandmarkIndex for the "landmarks" strategy
+        self.landmarks = None
+
+        # Rows, rows/sec and peak RSS, when loaded by `from_csv`
+        self.load_stats = None
+
+    @classmethod
+    def from_data(cls, people, movies):
+        """
+        Build a graph from the `people` and `movies` dictionaries
+        filled in by `degrees.load_data`.
+        """
+        graph = cls()
+        for person_id, person in people.items():
+            graph.add_person(person_id, person["name"], person["birth"])
+        for movie_id, movie in movies.items():
+            graph.add_movie(movie_id, movie["title"], movie["year"])
+        graph.build((
+            (graph.person_index[person_id], graph.movie_index[movie_id])
+            for person_id, person in people.items()
+            for movie_id in person["movies"]
+        ))
+        return graph
+
+    @classmethod
+    def from_csv(cls, directory, metadata=True):
+        """
+        Stream the CSV files in `directory` straight into a graph.
+
+        Rows are read positionally with `csv.reader`, ids and names are
+        interned, and star rows go directly into flat arrays, so no
+        per-row dictionaries or per-person sets are ever built. With
+        `metadata` False, birth and year columns are skipped and stored
+        as empty strings.
+
+        Sets `load_stats` to the row count, rows per second and the
+        process's peak resident set size in bytes.
+        """
+        graph = cls()
+        start = time.perf_counter()
+        rows = 0
+        intern = sys.intern
+
+        with open(os.path.join(directory, "people.csv"), encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            id_column = header.index("id")
+            name_column = header.index("name")
+            birth_column = header.index("birth") if metadata else None
+            for row in reader:
+                rows += 1
+                person_id = intern(row[id_column])
+                if person_id in graph.person_index:
+                    continue
+                birth = row[birth_column] if metadata else ""
+                graph.add_person(person_id, intern(row[name_column]), birth)
+
+        with open(os.path.join(directory, "movies.csv"), encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            id_column = header.index("id")
+            title_column = header.index("title")
+            year_column = header.index("year") if metadata else None
+            for row in reader:
+                rows += 1
+                movie_id = intern(row[id_column])
+                if movie_id in graph.movie_index:
+                    continue
+                year = row[year_column] if metadata else ""
+                graph.add_movie(movie_id, row[title_column], year)
+
+        persons = array("i")
+        films = array("i")
+        with open(os.path.join(directory, "stars.csv"), encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            person_column = header.index("person_id")
+            movie_column = header.index("movie_id")
+            person_index = graph.person_index
+            movie_index = graph.movie_index
+            for row in reader:
+                rows += 1
+                person = person_index.get(row[person_column])
+                movie = movie_index.get(row[movie_column])
+                if person is None or movie is None:
+                    continue
+                persons.append(person)
+                films.append(movie)
+        graph.build_arrays(persons, films)
+
+        elapsed = time.perf_counter() - start
+        graph.load_stats = {
+            "rows": rows,
+            "seconds": elapsed,
+            "rows_per_sec": rows / elapsed if elapsed else 0.0,
+            "peak_rss": peak_rss(),
+        }
+        return graph
+
+    def add_person(self, person_id, name, birth):
+        """
+        Intern a person and return their index.
+        """
+        index = len(self.person_ids)
+        self.person_ids.append(person_id)
+        self.person_index[person_id] = index
+        self.person_names.append(name)
+        self.person_births.append(birth)
+        self.names.setdefault(name.lower(), []).append(index)
+        return index
+
+    def add_movie(self, movie_id, title, year):
+        """
+        Intern a movie and return its index.
+        """
+        index = len(self.movie_ids)
+        self.movie_ids.append(movie_id)
+        self.movie_index[movie_id] = index
+        self.movie_titles.append(title)
+        self.movie_years.append(year)
+        return index
+
+    def build(self, edges):
+        """
+        Build both CSR adjacency lists from an iterable of
+        (person, movie) index pairs. Duplicate pairs are dropped.
+        """
+        persons = array("i")
+        films = array("i")
+        for person, movie in edges:
+            persons.append(person)
+            films.append(movie)
+        self.build_arrays(persons, films)
+
+    def build_arrays(self, persons, films):
+        """
+        Build both CSR adjacency lists from parallel arrays of person
+        and movie indexes. Duplicate pairs are dropped.
+        """
+        self.person_offsets, self.person_movies = _csr(
+            persons, films, len(self.person_ids))
+        self.movie_offsets, self.movie_stars = _csr(
+            films, persons, len(self.movie_ids))
+
+    def person_count(self):
+        return len(self.person_ids)
+
+    def movie_count(self):
+        return len(self.movie_ids)
+
+    def movies_for(self, person):
+        """
+        Returns the movie indexes `person` starred in, as an array slice.
+        """
+        offsets = self.person_offsets
+        return self.person_movies[offsets[person]:offsets[person + 1]]
+
+    def stars_for(self, movie):
+        """
+        Returns the person indexes who starred in `movie`, as an array slice.
+        """
+        offsets = self.movie_offsets
+        return self.movie_stars[offsets[movie]:offsets[movie + 1]]
+
+    def neighbors(self, person):
+        """
+        Yields (movie, person) index pairs for people who starred
+        with `person`, walking the CSR arrays in place.
+        """
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_stars = self.movie_stars
+        for k in range(person_offsets[person], person_offsets[person + 1]):
+            movie = person_movies[k]
+            for j in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                yield movie, movie_stars[j]
+
+    def search(self, source, target):
+        """
+        Breadth-first search from person index `source` to `target`.
+
+        Returns the list of (movie, person) index pairs on a shortest
+        path, or None if the two are not connected. Each movie's cast is
+        scanned at most once, and the only per-query allocations are the
+        parent arrays and the queue.
+        """
+        if source == target:
+            return []
+
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_stars = self.movie_stars
+
+        parent = array("i", [-1]) * len(self.person_ids)
+        via = array("i", [-1]) * len(self.person_ids)
+        movie_seen = bytearray(len(self.movie_ids))
+        parent[source] = source
+        self.expanded = 0
+
+        queue = deque([source])
+        while queue:
+            person = queue.popleft()
+            self.expanded += 1
+            for k in range(person_offsets[person], person_offsets[person + 1]):
+                movie = person_movies[k]
+                if movie_seen[movie]:
+                    continue
+                movie_seen[movie] = 1
+                for j in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                    star = movie_stars[j]
+                    if parent[star] != -1:
+                        continue
+                    parent[star] = person
+                    via[star] = movie
+                    if star == target:
+                        return _trace(parent, via, source, target)
+                    queue.append(star)
+        return None
+
+    def distances(self, source):
+        """
+        Breadth-first search from person index `source` to everyone.
+
+        Returns (depth, parent, via) arrays indexed by person: the
+        degrees of separation from `source` (-1 if unreachable), and the
+        person and movie each was reached through. `_trace` on parent and
+        via rebuilds the path to any reachable person.
+        """
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_stars = self.movie_stars
+
+        depth = array("i", [-1]) * len(self.person_ids)
+        parent = array("i", [-1]) * len(self.person_ids)
+        via = array("i", [-1]) * len(self.person_ids)
+        movie_seen = bytearray(len(self.movie_ids))
+        depth[source] = 0
+        parent[source] = source
+        self.expanded = 0
+
+        queue = deque([source])
+        while queue:
+            person = queue.popleft()
+            self.expanded += 1
+            level = depth[person] + 1
+            for k in range(person_offsets[person], person_offsets[person + 1]):
+                movie = person_movies[k]
+                if movie_seen[movie]:
+                    continue
+                movie_seen[movie] = 1
+                for j in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                    star = movie_stars[j]
+                    if depth[star] == -1:
+                        depth[star] = level
+                        parent[star] = person
+                        via[star] = movie
+                        queue.append(star)
+        return depth, parent, via
+
+    def separation_histogram(self, samples=100, seed=None):
+        """
+        Estimate the degree-of-separation histogram over all pairs of
+        people by running one `distances` search from each of `samples`
+        randomly chosen sources (every person, if `samples` is None).
+
+        Returns a Counter mapping degrees to the number of (source,
+        target) pairs at that distance, with unreachable pairs counted
+        under None. Each source is paired with every other person.
+        """
+        n = len(self.person_ids)
+        if samples is None or samples >= n:
+            sources = range(n)
+        else:
+            sources = random.Random(seed).sample(range(n), samples)
+
+        histogram = Counter()
+        for source in sources:
+            depth = self.distances(source)[0]
+            counts = Counter(depth)
+            counts[0] -= 1
+            for distance, count in counts.items():
+                if count:
+                    histogram[None if distance == -1 else distance] += count
+        return histogram
+
+    def bidirectional_search(self, source, target, limit=None,
+                             forward_estimate=None, backward_estimate=None):
+        """
+        Bidirectional breadth-first search from person index `source`
+        to `target`.
+
+        Grows one frontier from each end, always expanding a full level
+        of whichever frontier is smaller, and stops at the first level
+        where the two searches meet. Returns the same path length as
+        `search`, as a list of (movie, person) index pairs, or None.
+
+        Given a `limit` no shorter than the answer, each side leaves off
+        its frontier any person whose depth plus the side's estimate (a
+        lower bound on the distance to the far end) exceeds the limit.
+        """
+        if source == target:
+            return []
+
+        n = len(self.person_ids)
+        forward = _Side(source, n, len(self.movie_ids))
+        backward = _Side(target, n, len(self.movie_ids))
+        if limit is not None:
+            forward.limit, forward.estimate = limit, forward_estimate
+            backward.limit, backward.estimate = limit, backward_estimate
+        self.expanded = 0
+
+        while forward.frontier and backward.frontier:
+            if len(forward.frontier) <= len(backward.frontier):
+                side, other = forward, backward
+            else:
+                side, other = backward, forward
+            meeting = self._expand_level(side, other)
+            if meeting is not None:
+                path = _trace(forward.parent, forward.via, source, meeting)
+                person = meeting
+                while person != target:
+                    path.append((backward.via[person], backward.parent[person]))
+                    person = backward.parent[person]
+                return path
+        return None
+
+    def _expand_level(self, side, other):
+        """
+        Expand every person on `side`'s frontier by one level.
+
+        Returns the person where the two searches meet on the shortest
+        combined path found in this level, or None if they did not meet.
+        """
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_stars = self.movie_stars
+        parent = side.parent
+        via = side.via
+        depth = side.depth
+        movie_seen = side.movie_seen
+        other_depth = other.depth
+        estimate = side.estimate
+        limit = side.limit
+
+        best = None
+        best_length = 0
+        level = side.depth[side.frontier[0]] + 1
+        frontier = []
+        for person in side.frontier:
+            self.expanded += 1
+            for k in range(person_offsets[person], person_offsets[person + 1]):
+                movie = person_movies[k]
+                if movie_seen[movie]:
+                    continue
+                movie_seen[movie] = 1
+                for j in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                    star = movie_stars[j]
+                    if depth[star] != -1:
+                        continue
+                    depth[star] = level
+                    parent[star] = person
+                    via[star] = movie
+                    if other_depth[star] != -1:
+                        length = level + other_depth[star]
+                        if best is None or length < best_length:
+                            best = star
+                            best_length = length
+                    elif estimate is not None and level + estimate(star) > limit:
+                        continue
+                    frontier.append(star)
+        side.frontier = frontier
+        return best
+
+    def shortest_path(self, source, target, strategy="bfs"):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target, using IMDb ids.
+
+        `strategy` is "bfs" for a single breadth-first search from the
+        source, "bidirectional" to search from both ends at once, or
+        "landmarks" for a search pruned by the landmark index.
+
+        If no possible path, returns None.
+        """
+        if strategy == "bfs":
+            search = self.search
+        elif strategy == "bidirectional":
+            search = self.bidirectional_search
+        elif strategy == "landmarks":
+            if self.landmarks is None:
+                raise ValueError("no landmark index loaded")
+            search = self.landmarks.search
+        else:
+            raise ValueError(f"unknown search strategy: {strategy}")
+        path = search(self.person_index[source], self.person_index[target])
+        if path is None:
+            return None
+        return [
+            (self.movie_ids[movie], self.person_ids[person])
+            for movie, person in path
+        ]
+
+
+class _Side():
+    """
+    Search state for one end of a bidirectional search.
+    """
+
+    def __init__(self, start, people, movies):
+        self.parent = array("i", [-1]) * people
+        self.via = array("i", [-1]) * people
+        self.depth = array("i", [-1]) * people
+        self.movie_seen = bytearray(movies)
+        self.parent[start] = start
+        self.depth[start] = 0
+        self.frontier = [start]
+
+        # Optional pruning bound, see Graph.bidirectional_search
+        self.limit = None
+        self.estimate = None
+
+
+def peak_rss():
+    """
+    Returns the peak resident set size of this process in bytes.
+    """
+    # VmHWM covers only this program image; ru_maxrss on Linux also
+    # carries over the peak of whatever process exec'd it
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _csr(rows, cols, n):
+    """
+    Returns (offsets, indexes) CSR arrays for `n` rows from parallel
+    arrays of row and column indexes, using a counting sort.
+    Each row is sorted and duplicate columns are dropped.
+    """
+    offsets = array("i", [0]) * (n + 1)
+    for row in rows:
+        offsets[row + 1] += 1
+    for i in range(n):
+        offsets[i + 1] += offsets[i]
+
+    indexes = array("i", [0]) * len(rows)
+    cursor = array("i", offsets)
+    for row, col in zip(rows, cols):
+        indexes[cursor[row]] = col
+        cursor[row] += 1
+
+    # Sort each row and compact away duplicates in place
+    write = 0
+    start = 0
+    for i in range(n):
+        end = offsets[i + 1]
+        offsets[i] = write
+        previous = -1
+        for col in sorted(indexes[start:end]):
+            if col != previous:
+                indexes[write] = col
+                write += 1
+                previous = col
+        start = end
+    offsets[n] = write
+    del indexes[write:]
+    return offsets, indexes
+
+
+def _trace(parent, via, source, target):
+    """
+    Walk parent pointers back from `target` to `source` and return
+    the (movie, person) pairs in path order.
+    """
+    path = []
+    person = target
+    while person != source:
+        path.append((via[person], person))
+        person = parent[person]
+    path.reverse()
+    return path
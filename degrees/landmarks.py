@@ -0,0 +1,186 @@
+import mmap
+import os
+from array import array
+
+import snapshot
+
+MAGIC = b"DEGLAND1"
+FILENAME = "degrees.landmarks"
+LANDMARKS = 32
+
+# Landmarks consulted per query when pruning a search
+ACTIVE = 4
+
+# Widest gap between the bounds for which the search is pruned; with a
+# looser upper bound almost nothing is cut, and every discovered person
+# would still pay for an estimate
+GAP = 1
+
+
+class LandmarkIndex():
+    """
+    Breadth-first distances from a few high-degree people ("landmarks")
+    to everyone, used to bound the degrees of separation between any
+    two people without searching.
+
+    By the triangle inequality, for every landmark L:
+
+        |d(L, s) - d(L, t)| <= d(s, t) <= d(L, s) + d(L, t)
+    """
+
+    def __init__(self, graph, landmarks, rows):
+        self.graph = graph
+        self.landmarks = landmarks
+        # rows[i][person] is the distance from landmarks[i], or -1
+        self.rows = rows
+        self.buffer = None
+
+    @classmethod
+    def build(cls, graph, count=LANDMARKS):
+        """
+        Pick the `count` people with the most co-star slots and run one
+        `Graph.distances` search from each.
+        """
+        person_offsets = graph.person_offsets
+        person_movies = graph.person_movies
+        movie_offsets = graph.movie_offsets
+        degree = [
+            sum(
+                movie_offsets[movie + 1] - movie_offsets[movie]
+                for movie in person_movies[person_offsets[p]:person_offsets[p + 1]]
+            )
+            for p in range(graph.person_count())
+        ]
+        landmarks = sorted(
+            range(graph.person_count()), key=degree.__getitem__, reverse=True
+        )[:count]
+        rows = [array("h", graph.distances(landmark)[0]) for landmark in landmarks]
+        return cls(graph, landmarks, rows)
+
+    def save(self, directory, path=None):
+        """
+        Write the index next to the CSV files in `directory`, stamped
+        with their fingerprint so it is ignored once they change.
+        """
+        path = path or snapshot.path_for(directory, FILENAME)
+        contents = {
+            "sources": snapshot.fingerprint(directory),
+            "people": self.graph.person_count(),
+            "landmarks": list(self.landmarks),
+        }
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as f:
+            snapshot.write_header(f, MAGIC, contents)
+            for row in self.rows:
+                f.write(row)
+        os.replace(temporary, path)
+        return path
+
+    @classmethod
+    def load(cls, graph, directory, path=None):
+        """
+        Memory-map the landmark index for `directory`. Returns None if
+        there is none, or if it is stale or was built for another graph.
+        """
+        path = path or snapshot.path_for(directory, FILENAME)
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        with f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header = snapshot.read_header(buffer, MAGIC)
+        try:
+            current = snapshot.fingerprint(directory)
+        except FileNotFoundError:
+            current = None
+        if (header is None or header[0]["sources"] != current
+                or header[0]["people"] != graph.person_count()):
+            buffer.close()
+            return None
+
+        contents, start = header
+        n = contents["people"]
+        view = memoryview(buffer)[start:].cast("h")
+        rows = [view[i * n:(i + 1) * n] for i in range(len(contents["landmarks"]))]
+        index = cls(graph, contents["landmarks"], rows)
+        index.buffer = buffer
+        return index
+
+    def bounds(self, source, target):
+        """
+        Returns (lower, upper) bounds on the degrees of separation
+        between person indexes `source` and `target`.
+
+        Returns None if some landmark proves they are not connected.
+        `upper` is None if no landmark reaches both.
+        """
+        lower = 0
+        upper = None
+        for row in self.rows:
+            s = row[source]
+            t = row[target]
+            if (s == -1) != (t == -1):
+                return None
+            if s == -1:
+                continue
+            lower = max(lower, abs(s - t))
+            if upper is None or s + t < upper:
+                upper = s + t
+        return lower, upper
+
+    def search(self, source, target):
+        """
+        Bidirectional search from `source` to `target`. Returns
+        immediately when a landmark shows the two are not connected.
+        When the bounds are within `GAP` of each other, the search also
+        keeps off each frontier anyone who, by the landmark lower bound,
+        cannot lie on a path no longer than the upper bound.
+
+        Returns a shortest list of (movie, person) index pairs, or None.
+        """
+        graph = self.graph
+        graph.expanded = 0
+        if source == target:
+            return []
+        bounds = self.bounds(source, target)
+        if bounds is None:
+            return None
+        lower, upper = bounds
+        if upper is None or upper - lower > GAP:
+            return graph.bidirectional_search(source, target)
+
+        # Use only the landmarks that best separate this pair
+        rows = sorted(
+            self.rows, key=lambda row: abs(row[source] - row[target]),
+            reverse=True
+        )[:ACTIVE]
+        return graph.bidirectional_search(
+            source, target, upper,
+            _estimator(rows, target), _estimator(rows, source))
+
+
+def _estimator(rows, end):
+    """
+    Returns a function giving a lower bound on the distance from a
+    person to `end`, from the landmark distance rows.
+    """
+    rows = [(row, row[end]) for row in rows]
+    unreachable = len(rows[0][0]) if rows else 0
+
+    def estimate(person):
+        best = 0
+        for row, t in rows:
+            s = row[person]
+            if s == -1 or t == -1:
+                if s != t:
+                    return unreachable
+                continue
+            if s - t > best:
+                best = s - t
+            elif t - s > best:
+                best = t - s
+        return best
+
+    return estimate
@@ -0,0 +1,40 @@
+import os
+from multiprocessing import Pool
+
+import degrees
+import snapshot
+
+# Graph mapped by each worker process
+_graph = None
+_strategy = None
+
+
+def shortest_paths(directory, pairs, processes=None, strategy="bidirectional",
+                   chunksize=16):
+    """
+    Returns the shortest path for every (source, target) pair of
+    person ids, in order, searching in parallel across `processes`
+    worker processes (all cores by default).
+
+    Workers memory-map the binary snapshot for `directory` instead of
+    receiving a pickled copy of the graph, so the adjacency arrays are
+    shared through the page cache. The snapshot is (re)built first if
+    it is missing or stale.
+    """
+    if snapshot.load(directory) is None:
+        degrees.build_index(directory)
+    processes = processes or os.cpu_count()
+    with Pool(processes, _start, (directory, strategy)) as pool:
+        return pool.map(_search, pairs, chunksize)
+
+
+def _start(directory, strategy):
+    global _graph, _strategy
+    _graph = snapshot.load(directory)
+    if _graph is None:
+        raise RuntimeError(f"no up-to-date snapshot in {directory}")
+    _strategy = strategy
+
+
+def _search(pair):
+    return _graph.shortest_path(pair[0], pair[1], _strategy)
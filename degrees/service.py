@@ -0,0 +1,144 @@
+import json
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import degrees
+
+HOST = "127.0.0.1"
+PORT = 8000
+
+
+def main(argv):
+    """
+    Entry point for `python degrees.py batch ...` and
+    `python degrees.py serve ...`.
+    """
+    if argv[0] == "batch":
+        if len(argv) > 3:
+            sys.exit("Usage: python degrees.py batch [directory] [file]")
+        directory = argv[1] if len(argv) > 1 else "large"
+        degrees.load(directory)
+        if len(argv) == 3 and argv[2] != "-":
+            with open(argv[2], encoding="utf-8") as f:
+                run_batch(f, sys.stdout)
+        else:
+            run_batch(sys.stdin, sys.stdout)
+    else:
+        if len(argv) > 3:
+            sys.exit("Usage: python degrees.py serve [directory] [port]")
+        directory = argv[1] if len(argv) > 1 else "large"
+        port = int(argv[2]) if len(argv) == 3 else PORT
+        print("Loading data...", file=sys.stderr)
+        degrees.load(directory)
+        server = make_server(HOST, port)
+        print(f"Serving on http://{HOST}:{port}/", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+def answer(source_name, target_name, strategy="bidirectional"):
+    """
+    Answer one query by name and return a JSON-serializable dictionary.
+
+    Names must match exactly one person; there is nobody to ask which
+    one was meant, so ambiguous or unknown names are reported as errors.
+    """
+    result = {"source": source_name, "target": target_name}
+    ids = []
+    for name in (source_name, target_name):
+        person_ids = degrees.person_ids_for_name(name)
+        if len(person_ids) == 0:
+            result["error"] = f"Person not found: {name}"
+            return result
+        if len(person_ids) > 1:
+            result["error"] = f"Ambiguous name: {name}"
+            result["candidates"] = sorted(person_ids)
+            return result
+        ids.append(person_ids[0])
+
+    path = degrees.shortest_path(ids[0], ids[1], strategy)
+    if path is None:
+        result["degrees"] = None
+        result["path"] = None
+        return result
+    result["degrees"] = len(path)
+    result["path"] = [
+        {
+            "movie_id": movie_id,
+            "movie": degrees.movie_details(movie_id)["title"],
+            "person_id": person_id,
+            "person": degrees.person_details(person_id)["name"],
+        }
+        for movie_id, person_id in path
+    ]
+    return result
+
+
+def run_batch(lines, out):
+    """
+    Answer one query per input line and write one JSON object per line.
+
+    Each line holds a source and a target name separated by a tab.
+    Blank lines are skipped. Returns the number of queries answered.
+    """
+    count = 0
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if not line.strip():
+            continue
+        fields = line.split("\t")
+        if len(fields) != 2:
+            result = {"line": line, "error": "Expected source<TAB>target"}
+        else:
+            result = answer(fields[0].strip(), fields[1].strip())
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+        count += 1
+    return count
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    Answers `GET /path?source=<name>&target=<name>` with a JSON object.
+    """
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/path":
+            self.send_json(404, {"error": "Not found"})
+            return
+        query = parse_qs(url.query)
+        if "source" not in query or "target" not in query:
+            self.send_json(400, {"error": "source and target are required"})
+            return
+        strategy = query.get("strategy", ["bidirectional"])[0]
+        try:
+            result = answer(query["source"][0], query["target"][0], strategy)
+        except ValueError as error:
+            self.send_json(400, {"error": str(error)})
+            return
+        self.send_json(200, result)
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host=HOST, port=PORT):
+    """
+    Returns a threaded HTTP server answering queries against the graph
+    already loaded into `degrees`.
+    """
+    return ThreadingHTTPServer((host, port), QueryHandler)
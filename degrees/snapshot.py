@@ -0,0 +1,263 @@
+import json
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Sequence
+
+from graph import Graph
+
+MAGIC = b"DEGSNAP1"
+FILENAME = "degrees.snapshot"
+SOURCES = ("people.csv", "movies.csv", "stars.csv")
+
+# Header: magic, then the length of the JSON table of contents
+PREAMBLE = struct.Struct("<8sQ")
+
+# Integer sections, in file order
+ARRAYS = ("person_offsets", "person_movies", "movie_offsets", "movie_stars")
+
+# String tables, in file order
+STRINGS = (
+    "person_ids", "person_names", "person_births",
+    "movie_ids", "movie_titles", "movie_years",
+)
+
+
+def path_for(directory, filename=FILENAME):
+    """
+    Returns the path of a file named `filename` in a data directory,
+    by default the snapshot.
+    """
+    return os.path.join(directory, filename)
+
+
+def fingerprint(directory):
+    """
+    Returns the size and modification time of each CSV source, so a
+    snapshot can tell when it has gone stale.
+    """
+    result = {}
+    for source in SOURCES:
+        stat = os.stat(os.path.join(directory, source))
+        result[source] = [stat.st_size, stat.st_mtime_ns]
+    return result
+
+
+def save(graph, directory, path=None):
+    """
+    Write `graph` to a binary snapshot for the CSV files in `directory`.
+
+    The file holds the CSR arrays, every string table as a UTF-8 blob
+    with an offset array, and sorted permutations used to look up people
+    and movies by IMDb id, and people by name, without building a
+    dictionary.
+    """
+    path = path or path_for(directory)
+    sections = []
+    for name in ARRAYS:
+        sections.append((name, "i", getattr(graph, name)))
+    for name in STRINGS:
+        offsets, blob = _encode(getattr(graph, name))
+        sections.append((name + ".offsets", "q", offsets))
+        sections.append((name + ".blob", "B", blob))
+    sections.append(("person_index", "i", _order(graph.person_ids)))
+    sections.append(("movie_index", "i", _order(graph.movie_ids)))
+    sections.append(("names", "i", _order(graph.person_names, str.lower)))
+
+    # Lay sections out after the header, each aligned to 8 bytes
+    contents = {
+        "sources": fingerprint(directory),
+        "people": len(graph.person_ids),
+        "movies": len(graph.movie_ids),
+        "sections": {},
+    }
+    position = 0
+    for name, typecode, data in sections:
+        size = len(memoryview(data).cast("B"))
+        contents["sections"][name] = [typecode, position, size]
+        position += _pad(size)
+
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        write_header(f, MAGIC, contents)
+        for name, typecode, data in sections:
+            size = contents["sections"][name][2]
+            f.write(data)
+            f.write(b"\0" * (_pad(size) - size))
+    os.replace(temporary, path)
+    return path
+
+
+def load(directory, path=None):
+    """
+    Memory-map the snapshot for `directory` and return a `Graph` over it.
+
+    Returns None if there is no snapshot, or if any CSV source has
+    changed since the snapshot was written.
+    """
+    path = path or path_for(directory)
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    with f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    header = read_header(buffer, MAGIC)
+    if header is None:
+        buffer.close()
+        return None
+    contents, start = header
+    try:
+        current = fingerprint(directory)
+    except FileNotFoundError:
+        current = None
+    if contents["sources"] != current:
+        buffer.close()
+        return None
+
+    view = memoryview(buffer)
+
+    def section(name):
+        typecode, position, size = contents["sections"][name]
+        data = view[start + position:start + position + size]
+        return data.cast(typecode)
+
+    graph = Graph()
+    graph.snapshot = buffer
+    for name in ARRAYS:
+        setattr(graph, name, section(name))
+    for name in STRINGS:
+        setattr(graph, name, _StringTable(
+            section(name + ".offsets"), section(name + ".blob")))
+    graph.person_index = _UniqueIndex(
+        graph.person_ids, section("person_index"))
+    graph.movie_index = _UniqueIndex(
+        graph.movie_ids, section("movie_index"))
+    graph.names = _MultiIndex(
+        graph.person_names, section("names"), str.lower)
+    return graph
+
+
+def write_header(f, magic, contents):
+    """
+    Write the preamble and the JSON table of `contents` to `f`, padded
+    so the data written after it starts 8-byte aligned.
+    """
+    header = json.dumps(contents).encode()
+    f.write(PREAMBLE.pack(magic, len(header)))
+    f.write(header)
+    f.write(b"\0" * (_pad(PREAMBLE.size + len(header)) - PREAMBLE.size - len(header)))
+
+
+def read_header(buffer, magic):
+    """
+    Returns (contents, start) for a file written with `write_header`:
+    its table of contents and the offset at which its data starts.
+    Returns None if the file does not begin with `magic`.
+    """
+    found, length = PREAMBLE.unpack_from(buffer)
+    if found != magic:
+        return None
+    contents = json.loads(buffer[PREAMBLE.size:PREAMBLE.size + length])
+    return contents, _pad(PREAMBLE.size + length)
+
+
+class _StringTable(Sequence):
+    """
+    Read-only sequence of strings decoded on demand from a UTF-8 blob.
+    """
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("string table index out of range")
+        return bytes(
+            self.blob[self.offsets[index]:self.offsets[index + 1]]
+        ).decode()
+
+
+class _SortedIndex():
+    """
+    Maps strings to indexes by binary search over a permutation that
+    orders `keys` (after `fold`) alphabetically.
+    """
+
+    def __init__(self, keys, order, fold=None):
+        self.keys = keys
+        self.order = order
+        self.fold = fold or (lambda key: key)
+
+    def _range(self, key):
+        key = self.fold(key)
+        lookup = lambda index: self.fold(self.keys[index])
+        lo = bisect_left(self.order, key, key=lookup)
+        hi = bisect_right(self.order, key, lo=lo, key=lookup)
+        return lo, hi
+
+    def __contains__(self, key):
+        lo, hi = self._range(key)
+        return lo < hi
+
+
+class _UniqueIndex(_SortedIndex):
+    """
+    Stand-in for `Graph.person_index` and `Graph.movie_index`:
+    IMDb id -> interned index.
+    """
+
+    def __getitem__(self, key):
+        lo, hi = self._range(key)
+        if lo == hi:
+            raise KeyError(key)
+        return self.order[lo]
+
+    def get(self, key, default=None):
+        lo, hi = self._range(key)
+        return self.order[lo] if lo < hi else default
+
+
+class _MultiIndex(_SortedIndex):
+    """
+    Stand-in for `Graph.names`: lowercased name -> list of person indexes.
+    """
+
+    def get(self, key, default=None):
+        lo, hi = self._range(key)
+        if lo == hi:
+            return default
+        return list(self.order[lo:hi])
+
+
+def _encode(strings):
+    """
+    Returns (offsets, blob) for a sequence of strings.
+    """
+    offsets = array("q", [0])
+    blob = bytearray()
+    for string in strings:
+        blob += string.encode()
+        offsets.append(len(blob))
+    return offsets, blob
+
+
+def _order(keys, fold=None):
+    """
+    Returns an array of indexes into `keys`, sorted by key.
+    """
+    fold = fold or (lambda key: key)
+    return array("i", sorted(range(len(keys)), key=lambda i: fold(keys[i])))
+
+
+def _pad(size):
+    return (size + 7) & ~7
@@ -0,0 +1,411 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import convergence
+import crawler
+import incremental
+import linkgraph
+import pagerank
+import store
+import synthetic
+from linkgraph import LinkGraph, TransitionMatrix
+
+try:
+    from scipy.sparse import linalg as sparse_linalg
+except ImportError:
+    sparse_linalg = None
+
+PAGES = 100000
+LINKS = 8
+DANGLING = 0.1
+CYCLES = 100
+SAMPLES = 1000000
+
+MODELS = ("power-law", "uniform")
+
+# Relative residual to which the reference linear system is solved
+EXACT = 1e-13
+
+# Pages in the graph checked when SciPy is missing and the reference
+# has to be solved densely
+REFERENCE_PAGES = 1000
+
+# Allowed multiple of the expected L1 error of sampled ranks
+SAMPLING_SLACK = 2
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time and check the accuracy of the PageRank code.")
+    parser.add_argument("pages", nargs="?", type=int, default=PAGES)
+    parser.add_argument("--model", choices=sorted(MODELS), default="power-law")
+    parser.add_argument("--links", type=int, default=LINKS)
+    parser.add_argument("--dangling", type=float, default=DANGLING)
+    parser.add_argument("--cycles", type=int, default=CYCLES)
+    parser.add_argument("--samples", type=int, default=SAMPLES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS),
+                        help="run only these benchmarks")
+    args = parser.parse_args()
+
+    print(f"Generating {args.pages} pages ({args.model})...")
+    if args.model == "power-law":
+        corpus = synthetic.power_law_corpus(
+            args.pages, args.links, dangling=args.dangling,
+            cycles=args.cycles, seed=args.seed)
+    else:
+        corpus = synthetic.uniform_corpus(
+            args.pages, args.links, args.dangling, args.seed)
+    print(f"numpy backend: {'yes' if linkgraph.numpy is not None else 'no'}, "
+          f"scipy: {'yes' if linkgraph.sparse is not None else 'no'}")
+    for name in args.only or BENCHMARKS:
+        BENCHMARKS[name](corpus, args.samples)
+
+
+def bench_iteration(corpus, samples):
+    print("Power iteration")
+    start = time.perf_counter()
+    graph = LinkGraph.from_corpus(corpus)
+    matrix = TransitionMatrix(graph)
+    built = time.perf_counter() - start
+
+    tracemalloc.start()
+    TransitionMatrix(LinkGraph.from_corpus(corpus))
+    size = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"  build:       {built * 1000:10.1f} ms, {size / 2**20:8.1f} MiB")
+
+    ranks = matrix.uniform()
+    iterations = 0
+    start = time.perf_counter()
+    while True:
+        updated = matrix.step(ranks, pagerank.DAMPING)
+        iterations += 1
+        change = linkgraph.residual(ranks, updated)
+        ranks = updated
+        if change < pagerank.TOLERANCE:
+            break
+    elapsed = time.perf_counter() - start
+    print(f"  iterations:  {iterations:10d}, {iterations / elapsed:8.2f} iterations/sec, "
+          f"total {elapsed:.2f} s, sum {sum(ranks):.6f}")
+
+
+def bench_sampler(corpus, samples):
+    print(f"Sampler (n = {samples})")
+    modes = [("chain", False)]
+    if linkgraph.numpy is not None:
+        modes.append(("batch", True))
+    for label, batch in modes:
+        start = time.perf_counter()
+        pagerank.sample_pagerank(
+            corpus, pagerank.DAMPING, samples, batch=batch, seed=0)
+        elapsed = time.perf_counter() - start
+
+        # Measure memory on a separate run; tracing slows the sampler
+        tracemalloc.start()
+        pagerank.sample_pagerank(
+            corpus, pagerank.DAMPING, samples, batch=batch, seed=0)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"  {label:<8} {samples / elapsed:12.0f} samples/sec, "
+              f"peak {peak / 2**20:8.1f} MiB")
+
+
+def bench_parallel(corpus, samples):
+    print(f"Parallel surfers (n = {samples}, {pagerank.SURFERS} surfers, "
+          f"{os.cpu_count()} cores)")
+    processes = 1
+    while processes <= os.cpu_count():
+        start = time.perf_counter()
+        ranks, intervals = pagerank.parallel_sample_pagerank(
+            corpus, pagerank.DAMPING, samples, processes=processes)
+        elapsed = time.perf_counter() - start
+        width = sum(high - low for low, high in intervals.values()) / len(intervals)
+        print(f"  {f'{processes} processes':<14} {samples / elapsed:12.0f} samples/sec, "
+              f"mean interval width {width:.2e}")
+        processes *= 2
+
+
+def bench_crawl(corpus, samples):
+    print(f"Crawl ({len(corpus)} files, {os.cpu_count()} cores)")
+    with tempfile.TemporaryDirectory() as directory:
+        synthetic.write_html(corpus, directory)
+
+        start = time.perf_counter()
+        crawled = pagerank.crawl(directory)
+        elapsed = time.perf_counter() - start
+        print(f"  {'crawl':<14} {len(corpus) / elapsed:12.0f} files/sec")
+
+        edges = os.path.join(directory, "edges.tsv")
+        stats = crawler.stream_crawl(directory, edges)
+        print(f"  {'stream_crawl':<14} {stats['files_per_sec']:12.0f} files/sec, "
+              f"{stats['links']} links")
+        if crawler.read_edges(edges).to_corpus() != crawled:
+            sys.exit("Streamed edge list differs from crawl.")
+
+
+def bench_incremental(corpus, samples, changes=10):
+    print(f"Incremental update ({changes} of {len(corpus)} files changed)")
+    with tempfile.TemporaryDirectory() as directory:
+        synthetic.write_html(corpus, directory)
+        ranks, stats = incremental.incremental_pagerank(directory, pagerank.DAMPING)
+        print(f"  {'cold':<14} {stats['seconds'] * 1000:10.1f} ms, "
+              f"{stats['crawled']} files crawled")
+
+        rng = random.Random(0)
+        pages = sorted(corpus)
+        for page in rng.sample(pages, changes):
+            with open(os.path.join(directory, page), "a") as f:
+                f.write(f'<a href="{rng.choice(pages)}">new</a>\n')
+        ranks, stats = incremental.incremental_pagerank(directory, pagerank.DAMPING)
+        print(f"  {'warm':<14} {stats['seconds'] * 1000:10.1f} ms, "
+              f"{stats['crawled']} files crawled, {stats['pushes']} pushes")
+
+        start = time.perf_counter()
+        full = pagerank.iterate_pagerank(pagerank.crawl(directory), pagerank.DAMPING)
+        elapsed = time.perf_counter() - start
+        error = l1_error(ranks, full)
+        print(f"  {'full rerun':<14} {elapsed * 1000:10.1f} ms, L1 difference {error:.1e}")
+
+        # Both sides are within their own bound of the exact ranks; a
+        # residual of r leaves the pushed ranks at most 2r / (1 - d) off
+        bound = (iteration_bound(pagerank.TOLERANCE)
+                 + 2 * pagerank.TOLERANCE / (1 - pagerank.DAMPING))
+        if set(ranks) != set(full) or error > bound:
+            sys.exit("The incremental update disagrees with a full rerun.")
+
+
+def bench_store(corpus, samples):
+    print("Binary corpus file")
+    with tempfile.TemporaryDirectory() as directory:
+        synthetic.write_html(corpus, directory)
+        path = os.path.join(directory, "corpus" + store.EXTENSION)
+
+        start = time.perf_counter()
+        crawled = pagerank.crawl(directory)
+        print(f"  {'crawl HTML':<14} {(time.perf_counter() - start) * 1000:10.1f} ms")
+
+        start = time.perf_counter()
+        store.save(crawled, path)
+        print(f"  {'write':<14} {(time.perf_counter() - start) * 1000:10.1f} ms, "
+              f"{os.path.getsize(path) / 2**20:.1f} MiB")
+
+        start = time.perf_counter()
+        graph = store.load(path)
+        print(f"  {'mmap load':<14} {(time.perf_counter() - start) * 1000:10.1f} ms")
+
+        start = time.perf_counter()
+        pagerank.iterate_pagerank(graph, pagerank.DAMPING)
+        print(f"  {'rank mapped':<14} {(time.perf_counter() - start) * 1000:10.1f} ms")
+        del graph
+
+
+def bench_personalized(corpus, samples, vectors=32):
+    print(f"Personalized ({vectors} teleport vectors)")
+    rng = random.Random(0)
+    pages = sorted(corpus)
+    teleports = [
+        {page: 1 for page in rng.sample(pages, 10)} for _ in range(vectors)
+    ]
+    graph = LinkGraph.from_corpus(corpus)
+
+    start = time.perf_counter()
+    for teleport in teleports:
+        pagerank.iterate_pagerank(graph, pagerank.DAMPING, teleport=teleport)
+    print(f"  {'one at a time':<14} {(time.perf_counter() - start) * 1000:10.1f} ms")
+
+    start = time.perf_counter()
+    pagerank.personalized_pagerank(graph, pagerank.DAMPING, teleports)
+    print(f"  {'batched':<14} {(time.perf_counter() - start) * 1000:10.1f} ms")
+
+
+def l1_error(ranks, reference):
+    return sum(abs(ranks[page] - reference[page]) for page in reference)
+
+
+def exact_pagerank(corpus, damping_factor):
+    """
+    Returns the PageRank of `corpus` by solving the linear system
+
+        (I - d * P^T) x = (1 - d) / N
+
+    where P spreads each page evenly over its links, and a page with no
+    links over every page. Shares no code with the power iteration and
+    samplers it checks. With SciPy the system is sparse and solved by
+    GMRES; otherwise it is built densely from `transition_model`, which
+    only suits small corpora.
+    """
+    numpy = linkgraph.numpy
+    pages = sorted(corpus)
+    n = len(pages)
+    if sparse_linalg is not None:
+        index = {page: i for i, page in enumerate(pages)}
+        rows = []
+        columns = []
+        values = []
+        for j, page in enumerate(pages):
+            links = [index[link] for link in corpus[page] if link in index]
+            for i in links:
+                rows.append(i)
+                columns.append(j)
+                values.append(1 / len(links))
+        # A page with no links adds the same d * x[j] / N to every page,
+        # like the random jump, so leaving its column empty only scales
+        # the solution, which is normalized below
+        links = linkgraph.sparse.csr_matrix((values, (rows, columns)), shape=(n, n))
+        system = linkgraph.sparse.identity(n, format="csr") - damping_factor * links
+        ranks, info = sparse_linalg.gmres(
+            system, numpy.ones(n), rtol=EXACT, atol=0, restart=50, maxiter=1000)
+        if info != 0:
+            sys.exit("The reference PageRank system did not converge.")
+    else:
+        model = numpy.array([
+            [pagerank.transition_model(corpus, page, damping_factor)[target]
+             for page in pages]
+            for target in pages
+        ])
+        system = numpy.eye(n) - (model - (1 - damping_factor) / n)
+        ranks = numpy.linalg.solve(system, numpy.full(n, (1 - damping_factor) / n))
+    ranks = ranks / ranks.sum()
+    return {page: float(ranks[i]) for i, page in enumerate(pages)}
+
+
+def reference_corpus(corpus):
+    """
+    Returns (corpus, ranks): the corpus to check accuracy on and its
+    exact ranks, or None if they cannot be computed. Without SciPy a
+    small generated corpus stands in for `corpus`.
+    """
+    if linkgraph.numpy is None:
+        print("  skipped: the exact reference needs NumPy")
+        return None
+    if sparse_linalg is None:
+        print(f"  no SciPy: checking a generated {REFERENCE_PAGES}-page corpus")
+        corpus = synthetic.power_law_corpus(REFERENCE_PAGES, seed=0)
+    return corpus, exact_pagerank(corpus, pagerank.DAMPING)
+
+
+def iteration_bound(residual):
+    """
+    Returns the largest L1 error of power iteration stopped when the
+    change between steps was `residual`: each step contracts the error
+    by the damping factor.
+    """
+    return residual * pagerank.DAMPING / (1 - pagerank.DAMPING)
+
+
+def sampling_bound(reference, n):
+    """
+    Returns `SAMPLING_SLACK` times the expected L1 error of `n` samples
+    of the distribution `reference`, sum(sqrt(p)) / sqrt(n).
+    """
+    spread = sum(rank ** 0.5 for rank in reference.values())
+    return min(2.0, SAMPLING_SLACK * spread / n ** 0.5)
+
+
+def check(label, error, bound):
+    if error > bound:
+        sys.exit(f"{label}: L1 error {error:.2e} is over the bound {bound:.2e}.")
+
+
+def bench_accuracy(corpus, samples):
+    print(f"Accuracy (L1 error against a direct solve to {EXACT:g})")
+    reference = reference_corpus(corpus)
+    if reference is None:
+        return
+    corpus, reference = reference
+    graph = LinkGraph.from_corpus(corpus)
+
+    runs = [("iterate", iteration_bound(pagerank.TOLERANCE),
+             lambda: pagerank.iterate_pagerank(graph, pagerank.DAMPING))]
+    n = 10000
+    while n <= samples:
+        bound = sampling_bound(reference, n)
+        runs.append((f"chain n={n}", bound, lambda n=n: pagerank.sample_pagerank(
+            graph, pagerank.DAMPING, n, seed=0)))
+        runs.append((f"batch n={n}", bound, lambda n=n: pagerank.sample_pagerank(
+            graph, pagerank.DAMPING, n, batch=True, seed=0)))
+        n *= 10
+    runs.append((f"parallel n={samples}", sampling_bound(reference, samples),
+                 lambda: pagerank.parallel_sample_pagerank(
+                     graph, pagerank.DAMPING, samples)[0]))
+    for label, bound, run in runs:
+        start = time.perf_counter()
+        ranks = run()
+        elapsed = time.perf_counter() - start
+        error = l1_error(ranks, reference)
+        print(f"  {label:<16} {elapsed * 1000:10.1f} ms, "
+              f"L1 error {error:.2e} (bound {bound:.2e})")
+        check(label, error, bound)
+
+    # With no links at all every page is dangling, so ranks are uniform
+    for pages in (1, 2, 1000):
+        dangling = {page: set() for page in synthetic.page_names(pages)}
+        uniform = {page: 1 / pages for page in dangling}
+        error = l1_error(pagerank.iterate_pagerank(dangling, pagerank.DAMPING), uniform)
+        print(f"  {f'no links, {pages} pages':<16} L1 error {error:.2e}")
+        if error > pagerank.TOLERANCE:
+            sys.exit("Iteration is wrong on a corpus with no links.")
+
+
+def bench_convergence(corpus, samples):
+    print(f"Early stopping (L1 error against a direct solve to {EXACT:g})")
+    reference = reference_corpus(corpus)
+    if reference is None:
+        return
+    corpus, reference = reference
+    graph = LinkGraph.from_corpus(corpus)
+
+    policies = [
+        ("full budget", None),
+        ("monitored", lambda: convergence.EarlyStop()),
+        ("stable top-k", lambda: convergence.EarlyStop(stable=5)),
+        ("residual 1e-2", lambda: convergence.EarlyStop(tolerance=1e-2)),
+    ]
+    runs = [
+        ("chain", lambda stop: pagerank.sample_pagerank(
+            graph, pagerank.DAMPING, samples, seed=0, callback=stop)),
+        ("batch", lambda stop: pagerank.sample_pagerank(
+            graph, pagerank.DAMPING, samples, batch=True, seed=0, callback=stop)),
+        ("iterate", lambda stop: pagerank.iterate_pagerank(
+            graph, pagerank.DAMPING, callback=stop)),
+    ]
+    for label, run in runs:
+        for policy, make in policies:
+            stop = make() if make else None
+            start = time.perf_counter()
+            ranks = run(stop)
+            elapsed = time.perf_counter() - start
+            last = stop.history[-1] if stop and stop.history else None
+            steps = f"{last.step} steps" if last else ""
+            # Bound the error by what the run actually did before stopping
+            if label == "iterate":
+                bound = iteration_bound(last.residual if last else pagerank.TOLERANCE)
+            else:
+                bound = sampling_bound(reference, last.step if last else samples)
+            error = l1_error(ranks, reference)
+            print(f"  {f'{label} {policy}':<22} {elapsed * 1000:10.1f} ms, "
+                  f"L1 error {error:.2e} (bound {bound:.2e}) {steps}")
+            check(f"{label} {policy}", error, bound)
+
+
+BENCHMARKS = {
+    "iteration": bench_iteration,
+    "sampler": bench_sampler,
+    "parallel": bench_parallel,
+    "crawl": bench_crawl,
+    "incremental": bench_incremental,
+    "store": bench_store,
+    "personalized": bench_personalized,
+    "accuracy": bench_accuracy,
+    "convergence": bench_convergence,
+}
+
+
+if __name__ == "__main__":
+    main()
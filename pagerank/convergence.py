@@ -0,0 +1,98 @@
+import heapq
+import time
+from collections import namedtuple
+
+import linkgraph
+
+TOP_K = 10
+
+# One convergence report. `step` is the iteration number for power
+# iteration and the number of samples drawn so far for sampling;
+# `residual` is the L1 change in the normalized ranks since the last
+# report; `stability` is the fraction of the current top-k pages that
+# were also in the previous report's top k.
+Progress = namedtuple(
+    "Progress", ["step", "residual", "stability", "elapsed"])
+
+
+class Monitor():
+    """
+    Turns successive rank estimates into `Progress` reports and passes
+    them to `callback`, which returns True to stop the computation.
+    """
+
+    def __init__(self, callback, top_k=TOP_K):
+        self.callback = callback
+        self.top_k = top_k
+        self.start = time.perf_counter()
+        self.previous = None
+        self.previous_top = None
+
+    def report(self, step, ranks, change=None):
+        """
+        Report the estimate `ranks` (a vector summing to 1) at `step`.
+        `change` is the residual if the caller already computed it.
+        Returns True if the callback asked to stop.
+        """
+        if change is None:
+            if self.previous is None:
+                change = float("inf")
+            else:
+                change = linkgraph.residual(self.previous, ranks)
+        top = _top(ranks, self.top_k)
+        if self.previous_top is None:
+            stability = 0.0
+        else:
+            stability = len(top & self.previous_top) / max(1, len(top))
+        self.previous = ranks.copy() if hasattr(ranks, "copy") else list(ranks)
+        self.previous_top = top
+        progress = Progress(
+            step, change, stability, time.perf_counter() - self.start)
+        return bool(self.callback(progress))
+
+
+class EarlyStop():
+    """
+    Early-stop policy for use as a convergence callback.
+
+    Stops once the residual drops below `tolerance`, once the top-k
+    set has been unchanged for `stable` reports in a row, or once
+    `time_limit` seconds have passed; any criterion left as None is
+    ignored. With `verbose`, each report is printed.
+    """
+
+    def __init__(self, tolerance=None, stable=None, time_limit=None,
+                 verbose=False):
+        self.tolerance = tolerance
+        self.stable = stable
+        self.time_limit = time_limit
+        self.verbose = verbose
+        self.streak = 0
+        self.reason = None
+        self.history = []
+
+    def __call__(self, progress):
+        self.history.append(progress)
+        if self.verbose:
+            print(f"  step {progress.step}: residual {progress.residual:.3e}, "
+                  f"top-k stability {progress.stability:.0%}, "
+                  f"{progress.elapsed:.3f} s")
+        self.streak = self.streak + 1 if progress.stability == 1 else 0
+        if self.tolerance is not None and progress.residual < self.tolerance:
+            self.reason = "tolerance"
+        elif self.stable is not None and self.streak >= self.stable:
+            self.reason = "stable top-k"
+        elif self.time_limit is not None and progress.elapsed >= self.time_limit:
+            self.reason = "time limit"
+        return self.reason is not None
+
+
+def _top(ranks, k):
+    """
+    Returns the set of indexes of the `k` largest values in `ranks`.
+    """
+    numpy = linkgraph.numpy
+    k = min(k, len(ranks))
+    if numpy is not None and isinstance(ranks, numpy.ndarray):
+        return set(numpy.argpartition(ranks, -k)[-k:].tolist()) if k else set()
+    return set(heapq.nlargest(k, range(len(ranks)), key=ranks.__getitem__))
@@ -0,0 +1,110 @@
+import os
+import re
+import time
+from array import array
+from multiprocessing import Pool
+
+from linkgraph import LinkGraph, group
+
+LINK = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# Bytes of HTML read per chunk, and files handed to a worker at a time
+CHUNK_SIZE = 64 * 1024
+BATCH = 64
+
+
+def html_files(directory):
+    """
+    Yields the names of the HTML files in `directory`, in directory order.
+    """
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith(".html") and entry.is_file():
+                yield entry.name
+
+
+def extract_links(path, chunk_size=CHUNK_SIZE):
+    """
+    Returns the set of link targets in the HTML file at `path`.
+
+    The file is read in chunks of `chunk_size` characters. Text from the
+    last unfinished `<` of each chunk is carried into the next, so a
+    link split across a chunk boundary is still found.
+    """
+    links = set()
+    carry = ""
+    with open(path) as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            text = carry + chunk
+            links.update(LINK.findall(text))
+            start = text.rfind("<")
+            carry = text[start:] if start != -1 else ""
+    if carry:
+        links.update(LINK.findall(carry))
+    return links
+
+
+def stream_crawl(directory, output, processes=None):
+    """
+    Crawl `directory` in a process pool and write its link graph to the
+    edge-list file `output` as results arrive, without keeping every
+    page's links in memory.
+
+    The file starts with one line per page (its name alone), followed
+    by one `page<TAB>link` line per link to another page in the corpus.
+    Returns a dictionary with the page and link counts, elapsed seconds
+    and files per second.
+    """
+    start = time.perf_counter()
+    names = sorted(html_files(directory))
+    pages = set(names)
+    links = 0
+    paths = (os.path.join(directory, page) for page in names)
+    with Pool(processes) as pool, open(output, "w", encoding="utf-8") as f:
+        for page in names:
+            f.write(page + "\n")
+        results = pool.imap(_extract, paths, BATCH)
+        for page, found in zip(names, results):
+            for link in sorted(found):
+                if link in pages and link != page:
+                    f.write(f"{page}\t{link}\n")
+                    links += 1
+    elapsed = time.perf_counter() - start
+    return {
+        "pages": len(pages),
+        "links": links,
+        "seconds": elapsed,
+        "files_per_sec": len(pages) / elapsed if elapsed else 0.0,
+    }
+
+
+def _extract(path):
+    return extract_links(path)
+
+
+def read_edges(path):
+    """
+    Load an edge-list file written by `stream_crawl` into a `LinkGraph`.
+
+    Every page must be declared on a line of its own before any link
+    that mentions it.
+    """
+    pages = []
+    index = {}
+    sources = array("i")
+    targets = array("i")
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) == 1:
+                if fields[0] not in index:
+                    index[fields[0]] = len(pages)
+                    pages.append(fields[0])
+            else:
+                sources.append(index[fields[0]])
+                targets.append(index[fields[1]])
+    out_offsets, out_links = group(len(pages), sources, targets)
+    return LinkGraph(pages, out_offsets, out_links)
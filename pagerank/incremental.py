@@ -0,0 +1,471 @@
+import json
+import mmap
+import os
+import struct
+import time
+from array import array
+from collections.abc import Mapping
+
+import crawler
+import pagerank
+import store
+from linkgraph import LinkGraph, TransitionMatrix, residual
+
+CACHE = ".pagerank-cache"
+
+# State file header: magic, damping factor, sum of the unnormalized
+# ranks, number of pages with a file, and 1 while an update is written
+MAGIC = b"PRSTATE1"
+HEADER = struct.Struct("<8sddqq")
+
+# Each page's record in the state file is four 8-byte slots: file
+# size (-1 if the page has no file), mtime, unnormalized rank, and
+# residual not yet pushed
+RECORD = 4
+
+# Rewrite the base graph once the journal holds this fraction of its links
+COMPACT = 0.25
+
+
+def cache_path(directory):
+    """
+    Returns the path prefix of the incremental cache for a corpus directory.
+    """
+    return os.path.join(directory, CACHE)
+
+
+def incremental_pagerank(directory, damping_factor, tolerance=pagerank.TOLERANCE,
+                         path=None):
+    """
+    Return PageRank values for the corpus in `directory`, updating the
+    link graph and ranks cached by the previous call.
+
+    The ranks are kept unnormalized, as the solution w of
+
+        w = d * A w + 1
+
+    over the pages that have a file, where A spreads each page evenly
+    over its links and pages with no links drop out; PageRank is then
+    w / sum(w). Changed files are re-crawled and only their rows of the
+    graph are replaced. The residual the change leaves at their old and
+    new link targets is pushed through the graph, page by page, until
+    no page holds more than `tolerance` * sum(w) / N of it. The cache
+    files are patched in place rather than rewritten.
+
+    Detecting changes still stats every file, and loading the cache
+    decodes every page name; the re-crawl, the graph update and the
+    writes scale with the change. How far the push spreads depends on
+    the size of the change relative to `tolerance`.
+
+    Returns (ranks, stats): ranks maps page names to PageRank values,
+    and stats reports the pages, files re-crawled, residual pushes and
+    elapsed seconds.
+    """
+    path = path or cache_path(directory)
+    start = time.perf_counter()
+    cache = Cache.open(path, damping_factor)
+    if cache is None:
+        cache = Cache.build(directory, path, damping_factor, tolerance)
+        crawled = cache.live
+        pushes = 0
+    else:
+        crawled, pushes = cache.update(directory, tolerance)
+    ranks = cache.ranks()
+    cache.close()
+    return ranks, {
+        "pages": len(ranks),
+        "crawled": crawled,
+        "pushes": pushes,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+class Cache():
+    """
+    On-disk state of `incremental_pagerank`, in three files:
+
+        path.prc    the link graph as of the last compaction, in the
+                    binary corpus format of `store`
+        path.log    one JSON line per update since then, with the names
+                    it numbered and the outlink rows it replaced
+        path.state  each page's record, patched in place
+
+    Every name a link mentions is numbered once and keeps its number,
+    whether or not there is a file for it; links are followed only to
+    pages that have one.
+    """
+
+    def __init__(self, path, graph, names, rows, buffer, file):
+        self.path = path
+        self.graph = graph
+        self.names = names
+        self.index = {name: i for i, name in enumerate(names)}
+        # Outlink rows replaced since the base graph was written
+        self.rows = rows
+        self.buffer = buffer
+        self.file = file
+        self.damping, self.total, self.live, _ = HEADER.unpack_from(buffer)[1:]
+        self._views()
+
+    def _views(self):
+        records = memoryview(self.buffer)[HEADER.size:]
+        self.slots = records.cast("q")
+        self.values = records.cast("d")
+
+    def _release(self):
+        self.slots.release()
+        self.values.release()
+
+    @classmethod
+    def open(cls, path, damping_factor):
+        """
+        Returns the cache at `path`, or None if it is missing, was built
+        with another damping factor, or was left half written.
+        """
+        try:
+            graph = store.load(path + store.EXTENSION)
+            with open(path + ".log", encoding="utf-8") as f:
+                journal = [json.loads(line) for line in f]
+            file = open(path + ".state", "r+b")
+        except (OSError, ValueError, struct.error):
+            return None
+        buffer = mmap.mmap(file.fileno(), 0)
+        magic, damping, _, _, writing = HEADER.unpack_from(buffer)
+        names = list(graph.pages)
+        rows = {}
+        for entry in journal:
+            names.extend(entry["pages"])
+            for page, links in entry["links"].items():
+                rows[int(page)] = array("i", links)
+        if (magic != MAGIC or damping != damping_factor or writing
+                or len(buffer) != HEADER.size + 8 * RECORD * len(names)):
+            buffer.close()
+            file.close()
+            return None
+        return cls(path, graph, names, rows, buffer, file)
+
+    @classmethod
+    def build(cls, directory, path, damping_factor, tolerance):
+        """
+        Crawl every file in `directory`, solve for its ranks by power
+        iteration and write a new cache at `path`.
+        """
+        files = sorted(_scan(directory).items())
+        names = [name for name, _ in files]
+        index = {name: i for i, name in enumerate(names)}
+        out_offsets = array("i", [0])
+        out_links = array("i")
+        for name, (entry, _) in files:
+            for link in sorted(crawler.extract_links(entry) - {name}):
+                if link not in index:
+                    index[link] = len(names)
+                    names.append(link)
+                out_links.append(index[link])
+            out_offsets.append(len(out_links))
+        # Names only linked to have no file, and so no links
+        out_offsets.extend([len(out_links)] * (len(names) - len(files)))
+        graph = LinkGraph(names, out_offsets, out_links)
+        store.save(graph, path + store.EXTENSION)
+        with open(path + ".log", "w", encoding="utf-8"):
+            pass
+
+        # Iterate over the pages with files, which are numbered first
+        live = len(files)
+        links = array("i")
+        offsets = array("i", [0])
+        for page in range(live):
+            links.extend(link for link in graph.links(page) if link < live)
+            offsets.append(len(links))
+        data = bytearray(HEADER.size + 8 * RECORD * len(names))
+        HEADER.pack_into(data, 0, MAGIC, damping_factor, 0.0, live, 0)
+        records = memoryview(data)[HEADER.size:]
+        slots = records.cast("q")
+        values = records.cast("d")
+        for page in range(len(files), len(names)):
+            slots[RECORD * page] = -1
+        total = 0.0
+        if live:
+            matrix = TransitionMatrix(LinkGraph(names[:live], offsets, links))
+            ranks = matrix.uniform()
+            for _ in range(pagerank.MAX_ITERATIONS):
+                updated = matrix.step(ranks, damping_factor)
+                if residual(ranks, updated) < tolerance:
+                    break
+                ranks = updated
+
+            # Scale to the unnormalized ranks, for which the last step's
+            # change is the residual still to push
+            linked = sum(float(ranks[p]) for p in range(live)
+                         if offsets[p + 1] > offsets[p])
+            total = live / (1 - damping_factor * linked)
+            for page, (_, (_, stamp)) in enumerate(files):
+                slots[RECORD * page] = stamp[0]
+                slots[RECORD * page + 1] = stamp[1]
+                values[RECORD * page + 2] = total * float(ranks[page])
+                values[RECORD * page + 3] = total * float(updated[page] - ranks[page])
+        HEADER.pack_into(data, 0, MAGIC, damping_factor, total, live, 0)
+        slots.release()
+        values.release()
+        records.release()
+        with open(path + ".state", "wb") as f:
+            f.write(data)
+        return cls.open(path, damping_factor)
+
+    def row(self, page):
+        """
+        Returns every page index `page` links to, with a file or not.
+        """
+        if page in self.rows:
+            return self.rows[page]
+        if page < len(self.graph):
+            return self.graph.links(page)
+        return ()
+
+    def links(self, page):
+        """
+        Returns the pages with a file that `page` links to.
+        """
+        slots = self.slots
+        return [link for link in self.row(page) if slots[RECORD * link] >= 0]
+
+    def linked_from(self, pages):
+        """
+        Returns the set of page indexes whose rows mention any of `pages`.
+        """
+        pages = set(pages)
+        found = set()
+        in_offsets, in_links = self.graph.inlinks()
+        for page in pages:
+            if page < len(self.graph):
+                found.update(in_links[in_offsets[page]:in_offsets[page + 1]])
+        # Replaced rows override what the base graph says
+        found.difference_update(self.rows)
+        for source, row in self.rows.items():
+            if not pages.isdisjoint(row):
+                found.add(source)
+        return found
+
+    def update(self, directory, tolerance):
+        """
+        Bring the cache up to date with the files in `directory`.
+        Returns (files re-crawled, residual pushes).
+        """
+        files = _scan(directory)
+        slots = self.slots
+        changed = {}
+        seen = bytearray(len(self.names))
+        for name, (entry, stamp) in files.items():
+            page = self.index.get(name)
+            if page is None:
+                changed[name] = (entry, stamp)
+                continue
+            seen[page] = 1
+            if (slots[RECORD * page] != stamp[0]
+                    or slots[RECORD * page + 1] != stamp[1]):
+                changed[name] = (entry, stamp)
+        removed = [page for page in range(len(self.names))
+                   if slots[RECORD * page] >= 0 and not seen[page]]
+        if not changed and not removed:
+            return 0, 0
+
+        # Number any new names and grow the state file to match
+        added = []
+        crawled = {}
+        for name, (entry, stamp) in sorted(changed.items()):
+            links = sorted(crawler.extract_links(entry) - {name})
+            for page in [name] + links:
+                if page not in self.index:
+                    self.index[page] = len(self.names)
+                    self.names.append(page)
+                    added.append(page)
+            row = array("i", (self.index[link] for link in links))
+            crawled[self.index[name]] = (stamp, row)
+        if added:
+            self._release()
+            self.buffer.resize(len(self.buffer) + 8 * RECORD * len(added))
+            self._views()
+            slots = self.slots
+            for page in range(len(self.names) - len(added), len(self.names)):
+                slots[RECORD * page] = -1
+
+        born = [page for page in crawled if slots[RECORD * page] < 0]
+        affected = set(crawled) | set(removed)
+        affected |= self.linked_from(born + removed)
+        before = {page: self.links(page) for page in affected}
+
+        self._mark(writing=True)
+        values = self.values
+        replaced = {}
+        for page, (stamp, row) in crawled.items():
+            slots[RECORD * page] = stamp[0]
+            slots[RECORD * page + 1] = stamp[1]
+            replaced[page] = row
+        for page in removed:
+            slots[RECORD * page] = -1
+            slots[RECORD * page + 1] = 0
+            replaced[page] = array("i")
+        self.rows.update(replaced)
+        self.live += len(born) - len(removed)
+        with open(self.path + ".log", "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "pages": added,
+                "links": {page: list(row) for page, row in replaced.items()},
+            }) + "\n")
+
+        # The residual is what each affected page's rank now sends to
+        # its new links less what it sent to its old ones
+        d = self.damping
+        touched = set()
+        for page in affected:
+            rank = values[RECORD * page + 2]
+            if rank == 0:
+                continue
+            old = before[page]
+            new = self.links(page)
+            for link in old:
+                values[RECORD * link + 3] -= d * rank / len(old)
+            for link in new:
+                values[RECORD * link + 3] += d * rank / len(new)
+            touched.update(old)
+            touched.update(new)
+        for page in removed:
+            self.total -= values[RECORD * page + 2]
+            values[RECORD * page + 2] = 0.0
+            values[RECORD * page + 3] = 0.0
+        for page in born:
+            values[RECORD * page + 3] += 1.0
+            touched.add(page)
+
+        pushes = self._push(touched, tolerance)
+        self._mark(writing=False)
+        if len(self.rows) and (sum(map(len, self.rows.values())) + len(self.rows)
+                               > COMPACT * max(1, len(self.graph.out_links))):
+            self.compact()
+        return len(crawled), pushes
+
+    def _push(self, pages, tolerance):
+        """
+        Push the residual of `pages`, and of every page it reaches,
+        until no page with a file holds more than tolerance * sum / N.
+        Returns the number of pushes.
+        """
+        slots = self.slots
+        values = self.values
+        d = self.damping
+        threshold = tolerance * self.total / max(1, self.live)
+        queue = [page for page in pages
+                 if slots[RECORD * page] >= 0
+                 and abs(values[RECORD * page + 3]) > threshold]
+        queued = set(queue)
+        links = {}
+        pushes = 0
+        position = 0
+        while position < len(queue):
+            page = queue[position]
+            position += 1
+            queued.discard(page)
+            amount = values[RECORD * page + 3]
+            values[RECORD * page + 3] = 0.0
+            values[RECORD * page + 2] += amount
+            self.total += amount
+            pushes += 1
+            if page not in links:
+                links[page] = self.links(page)
+            targets = links[page]
+            if not targets:
+                continue
+            share = d * amount / len(targets)
+            for link in targets:
+                value = values[RECORD * link + 3] + share
+                values[RECORD * link + 3] = value
+                if link not in queued and abs(value) > threshold:
+                    queued.add(link)
+                    queue.append(link)
+            if position > len(self.names):
+                # Drop the pushed prefix so the queue stays small
+                del queue[:position]
+                position = 0
+        return pushes
+
+    def _mark(self, writing):
+        HEADER.pack_into(self.buffer, 0, MAGIC, self.damping, self.total,
+                         self.live, int(writing))
+        self.buffer.flush()
+
+    def compact(self):
+        """
+        Rewrite the base graph with the replaced rows folded in, and
+        empty the journal.
+        """
+        out_offsets = array("i", [0])
+        out_links = array("i")
+        for page in range(len(self.names)):
+            out_links.extend(self.row(page))
+            out_offsets.append(len(out_links))
+        self.graph = LinkGraph(list(self.names), out_offsets, out_links)
+        store.save(self.graph, self.path + store.EXTENSION)
+        temporary = self.path + ".log.tmp"
+        with open(temporary, "w", encoding="utf-8"):
+            pass
+        os.replace(temporary, self.path + ".log")
+        self.rows = {}
+
+    def ranks(self):
+        """
+        Returns the current PageRank of each page with a file, as a
+        read-only mapping from page names.
+        """
+        return _Ranks(
+            self.names, self.index,
+            array("q", self.slots[0::RECORD].tobytes()),
+            array("d", self.values[2::RECORD].tobytes()),
+            self.total, self.live,
+        )
+
+    def close(self):
+        self._release()
+        self.buffer.close()
+        self.file.close()
+
+
+class _Ranks(Mapping):
+    """
+    Read-only mapping of page names to unnormalized ranks divided by
+    their sum, skipping names that have no file.
+    """
+
+    def __init__(self, names, index, sizes, weights, total, live):
+        self.names = names
+        self.index = index
+        self.sizes = sizes
+        self.weights = weights
+        self.total = total
+        self.live = live
+
+    def __getitem__(self, name):
+        page = self.index[name]
+        if self.sizes[page] < 0:
+            raise KeyError(name)
+        return self.weights[page] / self.total
+
+    def __iter__(self):
+        for page, name in enumerate(self.names):
+            if self.sizes[page] >= 0:
+                yield name
+
+    def __len__(self):
+        return self.live
+
+
+def _scan(directory):
+    """
+    Returns a dictionary mapping each HTML file in `directory` to its
+    path and (size, modification time).
+    """
+    files = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith(".html") and entry.is_file():
+                stat = entry.stat()
+                files[entry.name] = (entry.path, (stat.st_size, stat.st_mtime_ns))
+    return files
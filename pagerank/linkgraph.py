@@ -0,0 +1,297 @@
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    from scipy import sparse
+except ImportError:
+    sparse = None
+
+
+class LinkGraph():
+    """
+    Corpus link structure with pages interned to dense integers.
+
+    Outlinks are held in CSR form:
+
+        out_links[out_offsets[p]:out_offsets[p + 1]]
+            are the pages that page `p` links to
+
+    as flat `array("i")` buffers, so a corpus of millions of pages
+    costs a few bytes per link instead of a Python set per page.
+    Inlinks are built in the same form on first use.
+    """
+
+    def __init__(self, pages, out_offsets, out_links, in_offsets=None,
+                 in_links=None):
+        self.pages = pages
+        self.out_offsets = out_offsets
+        self.out_links = out_links
+        self.in_offsets = in_offsets
+        self.in_links = in_links
+        self._index = None
+
+    def __getstate__(self):
+        # Graphs mapped from a corpus file hold memoryviews, which cannot
+        # be pickled; send worker processes plain copies instead
+        state = {
+            "pages": list(self.pages),
+            "out_offsets": array("i", self.out_offsets),
+            "out_links": array("i", self.out_links),
+            "in_offsets": None,
+            "in_links": None,
+            "_index": None,
+        }
+        if self.in_offsets is not None:
+            state["in_offsets"] = array("i", self.in_offsets)
+            state["in_links"] = array("i", self.in_links)
+        return state
+
+    @property
+    def index(self):
+        """
+        Maps page names to page indexes, built on first use.
+        """
+        if self._index is None:
+            self._index = {page: i for i, page in enumerate(self.pages)}
+        return self._index
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Build a graph from a `crawl`-style dictionary mapping each page
+        to the set of pages it links to. Pages are numbered in sorted
+        order; links to pages outside the corpus are dropped.
+        """
+        if isinstance(corpus, cls):
+            return corpus
+        pages = sorted(corpus)
+        index = {page: i for i, page in enumerate(pages)}
+        out_offsets = array("i", [0])
+        out_links = array("i")
+        for page in pages:
+            out_links.extend(sorted(
+                index[link] for link in corpus[page] if link in index
+            ))
+            out_offsets.append(len(out_links))
+        return cls(pages, out_offsets, out_links)
+
+    def __len__(self):
+        return len(self.pages)
+
+    def links(self, page):
+        """
+        Returns the page indexes linked to by page index `page`.
+        """
+        return self.out_links[self.out_offsets[page]:self.out_offsets[page + 1]]
+
+    def out_degree(self, page):
+        return self.out_offsets[page + 1] - self.out_offsets[page]
+
+    def inlinks(self):
+        """
+        Returns (in_offsets, in_links), the CSR lists of pages linking
+        to each page, building them from the outlinks if needed.
+        """
+        if self.in_offsets is None:
+            sources = array("i")
+            for page in range(len(self.pages)):
+                sources.extend([page] * self.out_degree(page))
+            self.in_offsets, self.in_links = group(
+                len(self.pages), self.out_links, sources)
+        return self.in_offsets, self.in_links
+
+    def to_corpus(self):
+        """
+        Returns the `crawl`-style dictionary of page -> set of pages.
+        """
+        return {
+            page: {self.pages[link] for link in self.links(i)}
+            for i, page in enumerate(self.pages)
+        }
+
+    def named(self, ranks):
+        """
+        Returns a dictionary mapping page names to the values in `ranks`.
+        """
+        return {page: float(ranks[i]) for i, page in enumerate(self.pages)}
+
+
+def group(n, keys, values):
+    """
+    Returns (offsets, items): `values` counting-sorted into CSR form by
+    the matching `keys` in range(n), so that
+
+        items[offsets[k]:offsets[k + 1]]
+
+    are the values whose key is `k`, in their original order.
+    """
+    offsets = array("i", [0]) * (n + 1)
+    for key in keys:
+        offsets[key + 1] += 1
+    for i in range(n):
+        offsets[i + 1] += offsets[i]
+    items = array("i", [0]) * len(keys)
+    cursor = array("i", offsets)
+    for key, value in zip(keys, values):
+        items[cursor[key]] = value
+        cursor[key] += 1
+    return offsets, items
+
+
+class TransitionMatrix():
+    """
+    Sparse random-surfer transition matrix for a `LinkGraph`, built once
+    and applied repeatedly by power iteration.
+
+    Each page spreads its rank evenly over its outlinks; a page with no
+    outlinks (a dangling page) is treated as linking to every page,
+    which is folded into one scalar per step instead of N edges.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+        n = len(graph)
+        self.n = n
+        self.out_degree = array("i", (
+            graph.out_offsets[p + 1] - graph.out_offsets[p] for p in range(n)
+        ))
+        self.dangling = array("i", (
+            p for p in range(n) if self.out_degree[p] == 0
+        ))
+        # SciPy CSR link matrix for `step_batch`, built on first use
+        self.links = None
+        if numpy is not None:
+            offsets = numpy.frombuffer(graph.out_offsets, dtype=numpy.int32)
+            degree = numpy.diff(offsets)
+            self.sources = numpy.repeat(
+                numpy.arange(n, dtype=numpy.int32), degree)
+            self.targets = numpy.frombuffer(graph.out_links, dtype=numpy.int32)
+            self.inverse_degree = numpy.zeros(n)
+            linked = degree > 0
+            self.inverse_degree[linked] = 1 / degree[linked]
+            self.dangling_mask = ~linked
+
+    def uniform(self):
+        """
+        Returns the uniform starting rank vector.
+        """
+        if numpy is not None:
+            return numpy.full(self.n, 1 / self.n)
+        return array("d", [1 / self.n]) * self.n
+
+    def vector(self, values):
+        """
+        Returns a rank vector from a dictionary of page name -> rank.
+        Pages missing from `values` get the uniform share 1/N, and the
+        result is rescaled to sum to 1.
+        """
+        pages = self.graph.pages
+        ranks = array("d", (values.get(page, 1 / self.n) for page in pages))
+        total = sum(ranks)
+        for i in range(self.n):
+            ranks[i] /= total
+        if numpy is not None:
+            return numpy.frombuffer(ranks, dtype=numpy.float64).copy()
+        return ranks
+
+    def teleport_vector(self, weights):
+        """
+        Returns a random-jump vector from a dictionary of page name ->
+        weight, normalized to sum to 1. Unlisted pages get 0.
+        """
+        index = self.graph.index
+        jump = array("d", [0.0]) * self.n
+        for page, weight in weights.items():
+            if page in index:
+                jump[index[page]] += weight
+        total = sum(jump)
+        if total <= 0:
+            raise ValueError("teleport weights must be positive for some page")
+        for i in range(self.n):
+            jump[i] /= total
+        if numpy is not None:
+            return numpy.frombuffer(jump, dtype=numpy.float64).copy()
+        return jump
+
+    def step(self, ranks, damping_factor, teleport=None):
+        """
+        Returns the rank vector after one step of the random surfer.
+        Random jumps, and every step from a dangling page, follow the
+        `teleport` vector, or go to a uniformly random page if it is None.
+        """
+        n = self.n
+        if numpy is not None:
+            dangling = ranks[self.dangling_mask].sum()
+            share = ranks * self.inverse_degree
+            # bincount gives int64 when there are no links at all
+            result = numpy.bincount(
+                self.targets, weights=share[self.sources], minlength=n
+            ).astype(numpy.float64, copy=False)
+            result *= damping_factor
+            jump = 1 - damping_factor + damping_factor * dangling
+            if teleport is None:
+                result += jump / n
+            else:
+                result += jump * teleport
+            return result
+
+        dangling = 0.0
+        for p in self.dangling:
+            dangling += ranks[p]
+        jump = 1 - damping_factor + damping_factor * dangling
+        if teleport is None:
+            result = array("d", [jump / n]) * n
+        else:
+            result = array("d", (jump * t for t in teleport))
+        out_offsets = self.graph.out_offsets
+        out_links = self.graph.out_links
+        out_degree = self.out_degree
+        for p in range(n):
+            degree = out_degree[p]
+            if degree == 0:
+                continue
+            share = damping_factor * ranks[p] / degree
+            for k in range(out_offsets[p], out_offsets[p + 1]):
+                result[out_links[k]] += share
+        return result
+
+    def step_batch(self, ranks, damping_factor, teleports):
+        """
+        One surfer step for K rank vectors at once, given as the columns
+        of an N x K NumPy array, with matching teleport columns.
+
+        With SciPy available the link matrix is built once as a sparse
+        CSR matrix and applied to all K columns in one product;
+        otherwise each column is gathered with its own `bincount`.
+        """
+        dangling = ranks[self.dangling_mask].sum(axis=0)
+        if sparse is not None:
+            if self.links is None:
+                self.links = sparse.csr_matrix(
+                    (self.inverse_degree[self.sources],
+                     (self.targets, self.sources)),
+                    shape=(self.n, self.n))
+            result = self.links @ ranks
+        else:
+            share = ranks * self.inverse_degree[:, None]
+            result = numpy.empty_like(ranks)
+            for k in range(ranks.shape[1]):
+                result[:, k] = numpy.bincount(
+                    self.targets, weights=share[self.sources, k],
+                    minlength=self.n)
+        result *= damping_factor
+        result += (1 - damping_factor + damping_factor * dangling) * teleports
+        return result
+
+
+def residual(old, new):
+    """
+    Returns the L1 norm of the difference between two rank vectors.
+    """
+    if numpy is not None and isinstance(new, numpy.ndarray):
+        return float(numpy.abs(new - old).sum())
+    return sum(abs(a - b) for a, b in zip(old, new))
@@ -1,38 +1,114 @@
+import argparse
+import math
 import os
 import random
-import re
-import sys
+from array import array
+from multiprocessing import Pool
+
+import convergence
+import crawler
+import linkgraph
+import store
+from linkgraph import LinkGraph, TransitionMatrix, residual
 
 DAMPING = 0.85
 SAMPLES = 500
 
+# Convergence reports per sampling run when a callback is given
+REPORTS = 50
+
+# Power iteration stops once the L1 change between steps is this small
+TOLERANCE = 1e-6
+MAX_ITERATIONS = 1000
+
+# Surfers stepped together, and steps recorded between tallies, when
+# sampling in batch mode
+WALKERS = 1024
+CHUNK = 256
+
+# Independent surfers, and the z-score of the reported confidence
+# intervals, for parallel sampling
+SURFERS = 16
+Z = 1.96
+
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
-    print(f"PageRank Results from Sampling (n = {SAMPLES})")
+    parser = argparse.ArgumentParser(description="Rank the pages of a corpus.")
+    parser.add_argument("corpus", help="HTML directory, edge list or .prc file")
+    parser.add_argument("--samples", type=int, default=SAMPLES,
+                        help="most pages to sample")
+    parser.add_argument("--stop-residual", type=float, metavar="R",
+                        help="stop once the L1 change between reports is below R")
+    parser.add_argument("--stop-stable", type=int, metavar="K",
+                        help="stop once the top pages are unchanged for K reports")
+    parser.add_argument("--time-limit", type=float, metavar="SECONDS",
+                        help="stop each computation after this long")
+    parser.add_argument("--top-k", type=int, default=convergence.TOP_K,
+                        help="pages compared by --stop-stable")
+    parser.add_argument("--verbose", action="store_true",
+                        help="print convergence after every report")
+    args = parser.parse_args()
+
+    if store.is_corpus_file(args.corpus):
+        corpus = store.load(args.corpus)
+    elif os.path.isfile(args.corpus):
+        corpus = crawler.read_edges(args.corpus)
+    else:
+        corpus = crawl(args.corpus)
+
+    instrumented = args.verbose or any(
+        limit is not None
+        for limit in (args.stop_residual, args.stop_stable, args.time_limit))
+
+    def policy():
+        if not instrumented:
+            return None
+        return convergence.EarlyStop(
+            args.stop_residual, args.stop_stable, args.time_limit, args.verbose)
+
+    stop = policy()
+    ranks = sample_pagerank(corpus, DAMPING, args.samples, callback=stop,
+                            top_k=args.top_k)
+    samples = stop.history[-1].step if stop and stop.history else args.samples
+    print(f"PageRank Results from Sampling (n = {samples})")
+    report(stop)
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
-   
+    stop = policy()
+    ranks = iterate_pagerank(corpus, DAMPING, callback=stop, top_k=args.top_k)
+    print(f"PageRank Results from Iteration")
+    report(stop)
+    for page in sorted(ranks):
+        print(f"  {page}: {ranks[page]:.4f}")
+
 
-def crawl(directory):
+def report(stop):
+    """
+    Print why an `EarlyStop` policy ended a computation, if it did.
+    """
+    if stop is None or not stop.history:
+        return
+    last = stop.history[-1]
+    reason = stop.reason or "budget exhausted"
+    print(f"  ({reason} at step {last.step}, residual {last.residual:.3e}, "
+          f"{last.elapsed:.3f} s)")
+
+
+def crawl(directory, output=None):
     """
     Parse a directory of HTML pages and check for links to other pages.
     Return a dictionary where each key is a page, and values are
     a list of all other pages in the corpus that are linked to by the page.
+
+    If `output` is given, also write the corpus there in the binary
+    format of `store`, so later runs can rank it without parsing HTML.
     """
     pages = dict()
 
     # Extract all links from HTML files
-    for filename in os.listdir(directory):
-        if not filename.endswith(".html"):
-            continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
+    for filename in crawler.html_files(directory):
+        links = crawler.extract_links(os.path.join(directory, filename))
+        pages[filename] = links - {filename}
 
     # Only include links to other pages in the corpus
     for filename in pages:
@@ -41,55 +117,306 @@ def crawl(directory):
             if link in pages
         )
 
+    if output is not None:
+        store.save(pages, output)
     return pages
 
 
-def transition_model(corpus, page, damping_factor):
+def transition_model(corpus, page, damping_factor, teleport=None):
     """
     Return a probability distribution over which page to visit next,
     given a current page.
     With probability `damping_factor`, choose a link at random
     linked to by `page`. With probability `1 - damping_factor`, choose
     a link at random chosen from all pages in the corpus.
-    """
-    n=len(corpus)
-    model = dict()
-    for i in corpus:
-        if len(corpus[page])==0:
-            model[i]=1/n
-        elif i == page and len(corpus[i])!=0:
-            model[i]=(1-0.85)/n
 
-        elif i!=page and i in corpus[page]:
-            model[i]=(0.85/len(corpus[page]))+((1-0.85)/n)
-
-        elif i!=page and i not in corpus[page]:
-            model[i]=(1-0.85)/n
+    `teleport` optionally maps pages to weights for that random jump
+    (personalized PageRank); by default every page is equally likely.
+    A page with no links always jumps.
+    """
+    jump = teleport_distribution(corpus, teleport)
+    links = corpus[page]
+    if len(links) == 0:
+        return jump
+    model = {i: (1 - damping_factor) * jump[i] for i in corpus}
+    for link in links:
+        model[link] += damping_factor / len(links)
     return model
 
 
+def teleport_distribution(corpus, teleport=None):
+    """
+    Return the random-jump distribution over the pages in `corpus`:
+    uniform if `teleport` is None, otherwise its weights normalized to
+    sum to 1 (pages it does not mention get 0).
+    """
+    if teleport is None:
+        return {page: 1 / len(corpus) for page in corpus}
+    total = sum(teleport.get(page, 0) for page in corpus)
+    if total <= 0:
+        raise ValueError("teleport weights must be positive for some page")
+    return {page: teleport.get(page, 0) / total for page in corpus}
+
 
-def sample_pagerank(corpus, damping_factor, n):
+def sample_pagerank(corpus, damping_factor, n, batch=False, seed=None,
+                    callback=None, top_k=convergence.TOP_K):
     """
     Return PageRank values for each page by sampling `n` pages
     according to transition model, starting with a page at random.
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    Outlinks are flattened into arrays once, so each step is O(1):
+    with probability `damping_factor` follow a random link of the
+    current page, otherwise (or if it has no links) jump to a random
+    page. With `batch` set and NumPy available, `WALKERS` independent
+    surfers are stepped together as vectors and share the `n` samples.
+    `seed` makes the run reproducible.
+
+    `callback`, if given, receives a `convergence.Progress` about
+    `REPORTS` times per run (at each tally in batch mode) and may return
+    True to stop sampling early; the ranks then come from the samples
+    taken so far. `top_k` sets how many pages its stability covers.
     """
-    Page_Rank={}
-    for key in corpus:
-        Page_Rank[key]=int(0)
-    
-    current_page=random.choice(list(corpus.keys()))
-    for i in range(n):
-        Page_Rank[current_page]=Page_Rank[current_page]+1
-        model=transition_model(corpus,current_page,damping_factor)
-        current_page=random.choice(list(model.keys()))
-    
-    return {page:rank/n for page,rank in Page_Rank.items()}
+    graph = LinkGraph.from_corpus(corpus)
+    report = None
+    if callback is not None:
+        monitor = convergence.Monitor(callback, top_k)
+
+        def report(taken, counts):
+            return monitor.report(taken, _frequencies(counts, taken))
+
+    if batch and linkgraph.numpy is not None:
+        counts = _sample_batch(graph, damping_factor, n, seed, report)
+    else:
+        counts = _sample_chain(graph, damping_factor, n, seed, report)
+    total = sum(counts)
+    return {page: float(counts[i] / total) for i, page in enumerate(graph.pages)}
 
 
+def _sample_chain(graph, damping_factor, n, seed, report=None):
+    """
+    Walk one random surfer for `n` steps and return visit counts.
+    With `report`, pause every n / `REPORTS` steps to call
+    `report(steps taken, counts)`, and stop if it returns True.
+    """
+    rng = random.Random(seed)
+    counts = array("l", [0]) * len(graph)
+    page = rng.randrange(len(graph))
+    if report is None:
+        _walk(graph, damping_factor, n, rng, page, counts)
+        return counts
+
+    interval = max(1, -(-n // REPORTS))
+    taken = 0
+    while taken < n:
+        steps = min(interval, n - taken)
+        page = _walk(graph, damping_factor, steps, rng, page, counts)
+        taken += steps
+        if report(taken, counts):
+            break
+    return counts
+
+
+def _walk(graph, damping_factor, steps, rng, page, counts):
+    """
+    Walk `steps` steps from `page`, adding each visit to `counts`, and
+    return the page the surfer is on afterwards.
+    """
+    pages = len(graph)
+    out_offsets = graph.out_offsets
+    out_links = graph.out_links
+    for _ in range(steps):
+        counts[page] += 1
+        first = out_offsets[page]
+        degree = out_offsets[page + 1] - first
+        if degree and rng.random() < damping_factor:
+            page = out_links[first + int(rng.random() * degree)]
+        else:
+            page = rng.randrange(pages)
+    return page
+
+
+def _sample_batch(graph, damping_factor, n, seed, report=None):
+    """
+    Walk `WALKERS` surfers in lockstep with NumPy until `n` pages have
+    been visited in total, and return visit counts. With `report`, tally
+    about every n / `REPORTS` visits, call `report(steps taken, counts)`
+    after each tally, and stop if it returns True.
+    """
+    numpy = linkgraph.numpy
+    rng = numpy.random.default_rng(seed)
+    pages = len(graph)
+    out_offsets = numpy.frombuffer(graph.out_offsets, dtype=numpy.int32)
+    out_links = numpy.frombuffer(graph.out_links, dtype=numpy.int32)
+    out_degree = numpy.diff(out_offsets)
+
+    walkers = max(1, min(WALKERS, n))
+    steps = -(-n // walkers)
+    counts = numpy.zeros(pages, dtype=numpy.int64)
+    rows = min(steps, CHUNK)
+    if report is not None:
+        rows = max(1, min(rows, -(-n // (REPORTS * walkers))))
+    visits = numpy.empty((rows, walkers), dtype=numpy.int32)
+
+    current = rng.integers(pages, size=walkers, dtype=numpy.int32)
+    remaining = n
+    row = 0
+    for _ in range(steps):
+        visits[row] = current
+        row += 1
+        if row == len(visits) or row * walkers >= remaining:
+            recorded = visits[:row].ravel()[:remaining]
+            counts += numpy.bincount(recorded, minlength=pages)
+            remaining -= len(recorded)
+            row = 0
+            if report is not None and report(n - remaining, counts):
+                break
+        degree = out_degree[current]
+        follow = (rng.random(walkers) < damping_factor) & (degree > 0)
+        chosen = out_offsets[current] + (rng.random(walkers) * degree).astype(numpy.int32)
+        following = rng.integers(pages, size=walkers, dtype=numpy.int32)
+        following[follow] = out_links[chosen[follow]]
+        current = following
+    return counts
+
+
+def _frequencies(counts, taken):
+    """
+    Returns visit `counts` as a rank vector, divided by `taken`.
+    """
+    if linkgraph.numpy is not None:
+        return linkgraph.numpy.asarray(counts, dtype=float) / taken
+    return array("d", (count / taken for count in counts))
+
+
+def parallel_sample_pagerank(corpus, damping_factor, n, surfers=SURFERS,
+                             processes=None, seed=0):
+    """
+    Return (ranks, intervals) estimated from `surfers` independent
+    random surfers sharing `n` samples, run across a pool of
+    `processes` worker processes (all cores by default).
+
+    Surfer `i` is seeded from (`seed`, `i`), so results depend only on
+    `seed` and `surfers`, never on the number of processes. `ranks` is
+    the pooled visit frequency of each page, as from `sample_pagerank`.
+    `intervals` maps each page to a (low, high) confidence interval
+    from the spread of the surfers' individual estimates.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    surfers = max(1, min(surfers, n))
+    tasks = [
+        (f"{seed}:{i}", n // surfers + (i < n % surfers))
+        for i in range(surfers)
+    ]
+    with Pool(processes, _start_surfer, (graph, damping_factor)) as pool:
+        results = pool.map(_run_surfer, tasks)
+
+    ranks = {}
+    intervals = {}
+    for i, page in enumerate(graph.pages):
+        estimates = [counts[i] / steps for counts, (_, steps) in zip(results, tasks)]
+        ranks[page] = sum(counts[i] for counts in results) / n
+        if surfers > 1:
+            mean = sum(estimates) / surfers
+            variance = sum((e - mean) ** 2 for e in estimates) / (surfers - 1)
+            margin = Z * math.sqrt(variance / surfers)
+        else:
+            margin = math.inf
+        intervals[page] = (max(0.0, ranks[page] - margin), ranks[page] + margin)
+    return ranks, intervals
+
+
+# Graph and damping factor held by each parallel sampling worker
+_surfer_graph = None
+_surfer_damping = None
+
+
+def _start_surfer(graph, damping_factor):
+    global _surfer_graph, _surfer_damping
+    _surfer_graph = graph
+    _surfer_damping = damping_factor
+
+
+def _run_surfer(task):
+    seed, steps = task
+    return _sample_chain(_surfer_graph, _surfer_damping, steps, seed)
+
+
+def iterate_pagerank(corpus, damping_factor, tolerance=TOLERANCE,
+                     max_iterations=MAX_ITERATIONS, initial=None, teleport=None,
+                     callback=None, top_k=convergence.TOP_K):
+    """
+    Return PageRank values for each page by iteratively updating
+    PageRank values until convergence.
+
+    `corpus` is a `crawl` dictionary or a `LinkGraph`. The sparse
+    transition matrix is built once and applied by power iteration
+    until the L1 change between steps falls below `tolerance`. Pages
+    with no links count as linking to every page, including themselves.
+    `initial` optionally warm-starts the iteration from earlier ranks.
+    `teleport` optionally maps pages to random-jump weights, giving
+    personalized PageRank; dangling pages then jump the same way.
+    `callback`, if given, receives a `convergence.Progress` after every
+    step and may return True to stop early; `top_k` sets how many pages
+    its stability covers.
+
+    Return a dictionary where keys are page names, and values are
+    their PageRank value. All PageRank values sum to 1.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    matrix = TransitionMatrix(graph)
+    if initial is None:
+        ranks = matrix.uniform()
+    else:
+        ranks = matrix.vector(initial)
+    if teleport is not None:
+        teleport = matrix.teleport_vector(teleport)
+    monitor = None
+    if callback is not None:
+        monitor = convergence.Monitor(callback, top_k)
+    for iteration in range(1, max_iterations + 1):
+        updated = matrix.step(ranks, damping_factor, teleport)
+        change = residual(ranks, updated)
+        ranks = updated
+        if monitor is not None and monitor.report(iteration, ranks, change):
+            break
+        if change < tolerance:
+            break
+    return graph.named(ranks)
+
+
+def personalized_pagerank(corpus, damping_factor, teleports,
+                          tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS):
+    """
+    Return one personalized PageRank dictionary per teleport vector in
+    `teleports` (each a dictionary of page -> jump weight).
+
+    With NumPy available, all vectors are iterated together as the
+    columns of one N x K matrix; with SciPy too, each step is a single
+    sparse matrix-times-matrix product rather than K separate ones.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    matrix = TransitionMatrix(graph)
+    if linkgraph.numpy is None:
+        return [
+            iterate_pagerank(graph, damping_factor, tolerance, max_iterations,
+                             teleport=teleport)
+            for teleport in teleports
+        ]
+
+    jumps = linkgraph.numpy.column_stack([
+        matrix.teleport_vector(teleport) for teleport in teleports
+    ])
+    ranks = jumps.copy()
+    for _ in range(max_iterations):
+        updated = matrix.step_batch(ranks, damping_factor, jumps)
+        change = linkgraph.numpy.abs(updated - ranks).sum(axis=0).max()
+        ranks = updated
+        if change < tolerance:
+            break
+    return [graph.named(ranks[:, k]) for k in range(ranks.shape[1])]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,142 @@
+import json
+import mmap
+import os
+import struct
+from array import array
+from collections.abc import Sequence
+
+from linkgraph import LinkGraph
+
+MAGIC = b"PRCORP01"
+EXTENSION = ".prc"
+
+# Header: magic, then the length of the JSON table of contents
+PREAMBLE = struct.Struct("<8sQ")
+
+# Sections, in file order
+SECTIONS = (
+    ("page_offsets", "q"),
+    ("page_names", "B"),
+    ("out_offsets", "i"),
+    ("out_links", "i"),
+    ("in_offsets", "i"),
+    ("in_links", "i"),
+)
+
+
+def save(corpus, path):
+    """
+    Write a corpus (a `crawl` dictionary or a `LinkGraph`) to `path` in
+    the binary corpus format: a UTF-8 page-name table with offsets, and
+    CSR outlinks and inlinks, each section aligned to 8 bytes.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    page_offsets = array("q", [0])
+    page_names = bytearray()
+    for page in graph.pages:
+        page_names += page.encode()
+        page_offsets.append(len(page_names))
+    in_offsets, in_links = graph.inlinks()
+    data = {
+        "page_offsets": page_offsets,
+        "page_names": page_names,
+        "out_offsets": graph.out_offsets,
+        "out_links": graph.out_links,
+        "in_offsets": in_offsets,
+        "in_links": in_links,
+    }
+
+    contents = {"pages": len(graph.pages), "sections": {}}
+    position = 0
+    for name, typecode in SECTIONS:
+        size = len(memoryview(data[name]).cast("B"))
+        contents["sections"][name] = [typecode, position, size]
+        position += _pad(size)
+    header = json.dumps(contents).encode()
+    start = _pad(PREAMBLE.size + len(header))
+
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, len(header)))
+        f.write(header)
+        f.write(b"\0" * (start - PREAMBLE.size - len(header)))
+        for name, _ in SECTIONS:
+            size = contents["sections"][name][2]
+            f.write(data[name])
+            f.write(b"\0" * (_pad(size) - size))
+    os.replace(temporary, path)
+    return path
+
+
+def load(path):
+    """
+    Memory-map a binary corpus file and return a `LinkGraph` over it.
+
+    Nothing is parsed or copied up front: page names are decoded when
+    read, and the link arrays are views of the mapped file.
+    """
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, length = PREAMBLE.unpack_from(buffer)
+    if magic != MAGIC:
+        buffer.close()
+        raise ValueError(f"{path} is not a PageRank corpus file")
+    contents = json.loads(buffer[PREAMBLE.size:PREAMBLE.size + length])
+
+    view = memoryview(buffer)
+    start = _pad(PREAMBLE.size + length)
+    sections = {}
+    for name, (typecode, position, size) in contents["sections"].items():
+        sections[name] = view[start + position:start + position + size].cast(typecode)
+
+    graph = LinkGraph(
+        _Names(sections["page_offsets"], sections["page_names"]),
+        sections["out_offsets"], sections["out_links"],
+        sections["in_offsets"], sections["in_links"],
+    )
+    graph.buffer = buffer
+    return graph
+
+
+def is_corpus_file(path):
+    """
+    Returns True if `path` is a file starting with the corpus magic.
+    """
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+class _Names(Sequence):
+    """
+    Read-only sequence of page names decoded on demand.
+    """
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("page index out of range")
+        return bytes(
+            self.blob[self.offsets[index]:self.offsets[index + 1]]
+        ).decode()
+
+    def __iter__(self):
+        # Copy the blob once rather than slicing the mapping per name
+        blob = bytes(self.blob)
+        offsets = self.offsets
+        for i in range(len(offsets) - 1):
+            yield blob[offsets[i]:offsets[i + 1]].decode()
+
+
+def _pad(size):
+    return (size + 7) & ~7
@@ -0,0 +1,76 @@
+import itertools
+import os
+import random
+
+
+def page_names(n):
+    return [f"{i}.html" for i in range(n)]
+
+
+def uniform_corpus(n, links=8, dangling=0.1, seed=0):
+    """
+    Returns a `crawl`-style corpus of `n` pages, each linking to up to
+    `links` pages chosen uniformly; a `dangling` fraction have no links.
+    """
+    rng = random.Random(seed)
+    names = page_names(n)
+    corpus = {}
+    for i, name in enumerate(names):
+        if rng.random() < dangling:
+            corpus[name] = set()
+        else:
+            corpus[name] = {
+                names[j] for j in rng.sample(range(n), min(links, n))
+                if j != i
+            }
+    return corpus
+
+
+def power_law_corpus(n, links=8, exponent=1.0, dangling=0.1, cycles=0,
+                     cycle_length=5, seed=0):
+    """
+    Returns a `crawl`-style corpus of `n` pages shaped like a small web.
+
+    Out-degrees follow a Pareto distribution with mean about `links`,
+    and link targets are drawn with probability proportional to
+    `(rank + 1) ** -exponent`, so a few pages collect most inlinks.
+    A `dangling` fraction of pages have no links, and `cycles` rings of
+    `cycle_length` pages link only to the next page in the ring, forming
+    rank sinks that the random jump must escape.
+    """
+    rng = random.Random(seed)
+    names = page_names(n)
+    weights = list(itertools.accumulate(
+        (rank + 1) ** -exponent for rank in range(n)))
+    order = list(range(n))
+    rng.shuffle(order)
+
+    corpus = {}
+    for i, name in enumerate(names):
+        if rng.random() < dangling:
+            corpus[name] = set()
+            continue
+        degree = min(n - 1, max(1, int(rng.paretovariate(2.0) * links / 2)))
+        targets = rng.choices(order, cum_weights=weights, k=degree)
+        corpus[name] = {names[j] for j in targets if j != i}
+
+    ring_pages = rng.sample(range(n), min(n, cycles * cycle_length))
+    for c in range(0, len(ring_pages) - cycle_length + 1, cycle_length):
+        ring = ring_pages[c:c + cycle_length]
+        for k, page in enumerate(ring):
+            following = ring[(k + 1) % len(ring)]
+            corpus[names[page]] = {names[following]} - {names[page]}
+    return corpus
+
+
+def write_html(corpus, directory):
+    """
+    Write `corpus` to `directory` as one HTML file per page.
+    """
+    for page, links in corpus.items():
+        with open(os.path.join(directory, page), "w") as f:
+            f.write(f"<!DOCTYPE html>\n<html>\n<head><title>{page}</title></head>\n")
+            f.write("<body>\n")
+            for link in sorted(links):
+                f.write(f'<p><a href="{link}">{link}</a></p>\n')
+            f.write("</body>\n</html>\n")
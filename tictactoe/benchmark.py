@@ -0,0 +1,161 @@
+import argparse
+import sys
+import time
+
+import bitboard
+import book
+import engine
+import tictactoe as ttt
+
+# Boards for the engine benchmark: (rows, cols, k, radius)
+VARIANTS = ((3, 3, 3, None), (4, 4, 4, None), (5, 5, 4, None), (15, 15, 5, 2))
+
+# Seconds per engine move
+BUDGET = 0.5
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the tic-tac-toe AI.")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS),
+                        help="run only these benchmarks")
+    args = parser.parse_args()
+    for name in args.only or BENCHMARKS:
+        BENCHMARKS[name]()
+
+
+def naive_value(board, counter):
+    """
+    Returns the minimax value of `board` by walking the whole game tree,
+    as `minimax` did before it had a transposition table, counting
+    every node in `counter[0]`.
+    """
+    counter[0] += 1
+    if ttt.terminal(board):
+        return ttt.utility(board)
+    values = [naive_value(ttt.result(board, action), counter)
+              for action in ttt.actions(board)]
+    return max(values) if ttt.player(board) == ttt.X else min(values)
+
+
+def bench_minimax():
+    print("First move on an empty board")
+    board = ttt.initial_state()
+
+    counter = [0]
+    start = time.perf_counter()
+    expected = naive_value(board, counter)
+    elapsed = time.perf_counter() - start
+    print(f"  {'full tree':<14} {counter[0]:8d} nodes, {elapsed * 1000:10.1f} ms")
+
+    # Search without the solved table
+    solved = book.table
+    book.table = None
+
+    # Alpha-beta with the cells tried in plain row-major order
+    ordered = ttt.ORDERED
+    ttt.ORDERED = bitboard.FREE
+    ttt.table.clear()
+    start = time.perf_counter()
+    ttt.minimax(board)
+    elapsed = time.perf_counter() - start
+    ttt.ORDERED = ordered
+    print(f"  {'unordered':<14} {ttt.stats['nodes']:8d} nodes, {elapsed * 1000:10.1f} ms")
+
+    ttt.table.clear()
+    start = time.perf_counter()
+    move = ttt.minimax(board)
+    elapsed = time.perf_counter() - start
+    print(f"  {'cold table':<14} {ttt.stats['nodes']:8d} nodes, {elapsed * 1000:10.1f} ms")
+
+    start = time.perf_counter()
+    ttt.minimax(board)
+    elapsed = time.perf_counter() - start
+    print(f"  {'warm table':<14} {ttt.stats['nodes']:8d} nodes, {elapsed * 1000:10.1f} ms")
+    book.table = solved
+
+    if ttt.value(ttt.result(board, move)) != expected:
+        sys.exit(f"minimax chose {move}, which is not optimal.")
+
+
+def bench_book(repeat=10000):
+    print("Solved table")
+    start = time.perf_counter()
+    solved = book.solve()
+    elapsed = time.perf_counter() - start
+    print(f"  {'solve':<14} {len(solved):8d} positions, {elapsed * 1000:10.1f} ms")
+
+    start = time.perf_counter()
+    book.install()
+    elapsed = time.perf_counter() - start
+    print(f"  {'load':<14} {len(book.table):8d} positions, {elapsed * 1000:10.1f} ms")
+
+    board = ttt.result(ttt.initial_state(), (0, 2))
+    start = time.perf_counter()
+    for _ in range(repeat):
+        ttt.minimax(board)
+    elapsed = time.perf_counter() - start
+    print(f"  {'lookup':<14} {elapsed / repeat * 1e6:10.2f} us per minimax call")
+
+
+def walk(board, counter, actions, result, terminal):
+    """
+    Visit every position reachable from `board` with the given game
+    functions, counting them in `counter[0]`.
+    """
+    counter[0] += 1
+    if terminal(board):
+        return
+    for action in actions(board):
+        walk(result(board, action), counter, actions, result, terminal)
+
+
+def bench_positions():
+    print("Full game tree walk")
+    states = [
+        ("list boards", ttt.initial_state(),
+         ttt.actions, ttt.result, ttt.terminal),
+        ("Bitboard API", bitboard.initial_state(),
+         ttt.actions, ttt.result, ttt.terminal),
+        ("bitboard cells", bitboard.initial_state(),
+         bitboard.actions, bitboard.result, bitboard.terminal),
+    ]
+    for label, board, actions, result, terminal in states:
+        counter = [0]
+        start = time.perf_counter()
+        walk(board, counter, actions, result, terminal)
+        elapsed = time.perf_counter() - start
+        print(f"  {label:<14} {counter[0]:8d} positions, "
+              f"{counter[0] / elapsed:12.0f} positions/sec")
+
+
+def bench_engine():
+    print(f"m,n,k engine ({BUDGET:g} s per move, first 6 moves of self-play)")
+    for rows, cols, k, radius in VARIANTS:
+        game = engine.Game(rows, cols, k, radius)
+        state = game.initial_state()
+        depths = []
+        nodes = 0
+        slowest = 0.0
+        for _ in range(6):
+            if game.terminal(state):
+                break
+            action, stats = engine.search(game, state, BUDGET)
+            state = game.result(state, action)
+            depths.append(stats["depth"])
+            nodes += stats["nodes"]
+            slowest = max(slowest, stats["seconds"])
+        label = f"{rows}x{cols}, k={k}"
+        print(f"  {label:<14} depths {depths}, {nodes:8d} nodes, "
+              f"slowest move {slowest * 1000:.0f} ms")
+
+
+BENCHMARKS = {
+    "minimax": bench_minimax,
+    "book": bench_book,
+    "positions": bench_positions,
+    "engine": bench_engine,
+}
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+from collections import namedtuple
+
+X = "X"
+O = "O"
+EMPTY = None
+
+# A board as two 9-bit masks of the cells held by X and by O. Cell
+# (i, j) is bit 3 * i + j.
+Bitboard = namedtuple("Bitboard", ["x", "o"])
+
+FULL = 0b111111111
+
+# The eight winning lines
+WINS = (
+    0b000000111, 0b000111000, 0b111000000,
+    0b001001001, 0b010010010, 0b100100100,
+    0b100010001, 0b001010100,
+)
+
+# WON[mask] is 1 if `mask` holds a complete line
+WON = bytes(
+    any(mask & line == line for line in WINS) for mask in range(FULL + 1)
+)
+
+# COUNT[mask] is the number of cells set in `mask`
+COUNT = bytes(bin(mask).count("1") for mask in range(FULL + 1))
+
+# FREE[mask] lists the cells not set in `mask`
+FREE = tuple(
+    tuple(cell for cell in range(9) if not mask >> cell & 1)
+    for mask in range(FULL + 1)
+)
+
+
+def initial_state():
+    return Bitboard(0, 0)
+
+
+def from_list(board):
+    """
+    Returns the `Bitboard` for a nested-list board.
+    """
+    x = o = 0
+    bit = 1
+    for row in board:
+        for cell in row:
+            if cell == X:
+                x |= bit
+            elif cell == O:
+                o |= bit
+            bit <<= 1
+    return Bitboard(x, o)
+
+
+def to_list(board):
+    """
+    Returns the nested-list board for a `Bitboard`.
+    """
+    return [
+        [X if board.x >> (3 * i + j) & 1 else O if board.o >> (3 * i + j) & 1
+         else EMPTY for j in range(3)]
+        for i in range(3)
+    ]
+
+
+def player(board):
+    return X if COUNT[board.x] == COUNT[board.o] else O
+
+
+def actions(board):
+    """
+    Returns the empty cells of the board as bit indexes.
+    """
+    return FREE[board.x | board.o]
+
+
+def result(board, cell):
+    """
+    Returns the board after the player to move takes bit index `cell`.
+    """
+    x, o = board
+    if (x | o) >> cell & 1:
+        raise ValueError(f"cell {cell} is not empty")
+    if COUNT[x] == COUNT[o]:
+        return Bitboard(x | 1 << cell, o)
+    return Bitboard(x, o | 1 << cell)
+
+
+def winner(board):
+    if WON[board.x]:
+        return X
+    if WON[board.o]:
+        return O
+    return None
+
+
+def terminal(board):
+    return bool(WON[board.x] or WON[board.o] or board.x | board.o == FULL)
+
+
+def key(board):
+    """
+    Returns the board as one 18-bit integer.
+    """
+    return board.x | board.o << 9
@@ -0,0 +1,183 @@
+import os
+import struct
+import sys
+from array import array
+
+from bitboard import COUNT, FREE, FULL, WON
+
+MAGIC = b"TTTBOOK1"
+
+# Default location of the solved table, next to this module
+PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tictactoe.book")
+
+# Header: magic, then the number of positions
+PREAMBLE = struct.Struct("<8sI")
+
+# The eight symmetries of the board, as the cell each cell moves to
+SYMMETRIES = tuple(
+    tuple(3 * i + j for i, j in (transform(c // 3, c % 3) for c in range(9)))
+    for transform in (
+        lambda i, j: (i, j),
+        lambda i, j: (j, 2 - i),
+        lambda i, j: (2 - i, 2 - j),
+        lambda i, j: (2 - j, i),
+        lambda i, j: (i, 2 - j),
+        lambda i, j: (2 - i, j),
+        lambda i, j: (j, i),
+        lambda i, j: (2 - j, 2 - i),
+    )
+)
+
+# PERMUTE[s][mask] is `mask` with symmetry `s` applied
+PERMUTE = tuple(
+    array("H", (
+        sum(1 << cells[c] for c in range(9) if mask >> c & 1)
+        for mask in range(FULL + 1)
+    ))
+    for cells in SYMMETRIES
+)
+
+# INVERSE[s] is the symmetry that undoes symmetry `s`
+INVERSE = tuple(
+    next(t for t, back in enumerate(SYMMETRIES)
+         if all(back[cells[c]] == c for c in range(9)))
+    for cells in SYMMETRIES
+)
+
+# Solved positions: canonical key -> value (low 2 bits, as value + 1)
+# and the mask of optimal cells (bits 2 to 10), or None if not loaded
+table = None
+
+
+def canonical(x, o):
+    """
+    Returns (key, symmetry): the smallest key of the position under any
+    of the eight symmetries, and the symmetry that gives it.
+    """
+    best = None
+    chosen = 0
+    for s, permute in enumerate(PERMUTE):
+        k = permute[x] | permute[o] << 9
+        if best is None or k < best:
+            best = k
+            chosen = s
+    return best, chosen
+
+
+def lookup(x, o):
+    """
+    Returns (value, moves) for a position that is not over: its
+    minimax value for X, and the mask of cells that achieve it. Returns
+    None if no table is loaded or the position is not in it.
+    """
+    if table is None:
+        return None
+    k, s = canonical(x, o)
+    entry = table.get(k)
+    if entry is None:
+        return None
+    return (entry & 3) - 1, PERMUTE[INVERSE[s]][entry >> 2]
+
+
+def solve():
+    """
+    Returns the solved table for every reachable position that is not
+    over, one entry per symmetry class.
+    """
+    values = {}
+
+    def value(x, o):
+        k = x | o << 9
+        if k not in values:
+            if WON[x]:
+                values[k] = 1
+            elif WON[o]:
+                values[k] = -1
+            elif x | o == FULL:
+                values[k] = 0
+            elif COUNT[x] == COUNT[o]:
+                values[k] = max(value(x | 1 << c, o) for c in FREE[x | o])
+            else:
+                values[k] = min(value(x, o | 1 << c) for c in FREE[x | o])
+        return values[k]
+
+    solved = {}
+    stack = [(0, 0)]
+    while stack:
+        x, o = stack.pop()
+        k, _ = canonical(x, o)
+        if k in solved or WON[x] or WON[o] or x | o == FULL:
+            continue
+        x, o = k & FULL, k >> 9
+        if COUNT[x] == COUNT[o]:
+            children = {c: (x | 1 << c, o) for c in FREE[x | o]}
+        else:
+            children = {c: (x, o | 1 << c) for c in FREE[x | o]}
+        v = value(x, o)
+        moves = 0
+        for c, child in children.items():
+            if value(*child) == v:
+                moves |= 1 << c
+            stack.append(child)
+        solved[k] = (v + 1) | moves << 2
+    return solved
+
+
+def save(solved, path=PATH):
+    """
+    Write a solved table to `path`: the header, then the sorted keys
+    as 32-bit integers, then their entries as 16-bit integers.
+    """
+    keys = array("I", sorted(solved))
+    entries = array("H", (solved[k] for k in keys))
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, len(keys)))
+        f.write(keys.tobytes())
+        f.write(entries.tobytes())
+    os.replace(temporary, path)
+    return path
+
+
+def load(path=PATH):
+    """
+    Returns the solved table stored at `path`.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, count = PREAMBLE.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a solved tic-tac-toe table")
+    keys = array("I")
+    keys.frombytes(data[PREAMBLE.size:PREAMBLE.size + 4 * count])
+    entries = array("H")
+    entries.frombytes(data[PREAMBLE.size + 4 * count:])
+    if len(keys) != count or len(entries) != count:
+        raise ValueError(f"{path} is truncated")
+    return dict(zip(keys, entries))
+
+
+def install(path=PATH):
+    """
+    Load the solved table for `lookup`, solving the game now if the
+    file is missing or unreadable. Returns the table.
+    """
+    global table
+    try:
+        table = load(path)
+    except (OSError, ValueError, struct.error):
+        table = solve()
+    return table
+
+
+def main():
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python book.py [path]")
+    path = sys.argv[1] if len(sys.argv) == 2 else PATH
+    solved = solve()
+    save(solved, path)
+    print(f"Solved {len(solved)} positions into {path}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+import time
+
+from transposition import TranspositionTable
+
+X = "X"
+O = "O"
+EMPTY = None
+
+# Seconds each `search` may spend on a move by default
+TIME_LIMIT = 1.0
+
+# Score of a won position; evaluations must stay well below it
+WIN = 1000000
+
+# Kinds of score stored in the transposition table
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+class Game():
+    """
+    Rules of an m,n,k-game: `rows` by `cols` cells, won by the first
+    player to get `k` in a row horizontally, vertically or diagonally.
+    Tic-tac-toe is Game(3, 3, 3); gomoku is Game(15, 15, 5).
+
+    A state is a pair of integer masks (x, o) of the cells held by each
+    player, with cell (i, j) at bit `i * cols + j`. Every line of `k`
+    cells is precomputed as a mask, so a win is a mask comparison.
+
+    If `radius` is set, the search only considers empty cells within
+    that many steps of a piece already played, which keeps branching
+    manageable on large boards at the cost of exactness.
+    """
+
+    def __init__(self, rows=3, cols=3, k=3, radius=None):
+        if not 0 < k <= max(rows, cols):
+            raise ValueError(f"no line of {k} fits on a {rows}x{cols} board")
+        self.rows = rows
+        self.cols = cols
+        self.k = k
+        self.radius = radius
+        self.cells = rows * cols
+        self.full = (1 << self.cells) - 1
+
+        self.lines = []
+        for i in range(rows):
+            for j in range(cols):
+                for di, dj in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    end_i = i + di * (k - 1)
+                    end_j = j + dj * (k - 1)
+                    if 0 <= end_i < rows and 0 <= end_j < cols:
+                        self.lines.append(sum(
+                            1 << self.cell((i + di * s, j + dj * s))
+                            for s in range(k)
+                        ))
+        # With k = 1 every direction gives the same one-cell line
+        self.lines = list(dict.fromkeys(self.lines))
+
+        # Lines through each cell, to check only those after a move
+        self.lines_through = [
+            [line for line in self.lines if line >> cell & 1]
+            for cell in range(self.cells)
+        ]
+
+        # Cells ordered from the center outwards
+        middle = ((rows - 1) / 2, (cols - 1) / 2)
+        self.order = sorted(range(self.cells), key=lambda cell: (
+            abs(cell // cols - middle[0]) + abs(cell % cols - middle[1]), cell
+        ))
+
+        # Cells within `radius` of each cell, as a mask
+        self.near = []
+        for cell in range(self.cells):
+            i, j = divmod(cell, cols)
+            reach = radius or 0
+            self.near.append(sum(
+                1 << self.cell((a, b))
+                for a in range(max(0, i - reach), min(rows, i + reach + 1))
+                for b in range(max(0, j - reach), min(cols, j + reach + 1))
+            ))
+
+    def cell(self, action):
+        i, j = action
+        return i * self.cols + j
+
+    def action(self, cell):
+        return divmod(cell, self.cols)
+
+    def initial_state(self):
+        return (0, 0)
+
+    def from_list(self, board):
+        """
+        Returns the state for a nested-list board of X, O and EMPTY.
+        """
+        x = o = 0
+        bit = 1
+        for row in board:
+            for cell in row:
+                if cell == X:
+                    x |= bit
+                elif cell == O:
+                    o |= bit
+                bit <<= 1
+        return (x, o)
+
+    def to_list(self, state):
+        """
+        Returns the nested-list board for a state.
+        """
+        x, o = state
+        return [
+            [X if x >> cell & 1 else O if o >> cell & 1 else EMPTY
+             for cell in range(i * self.cols, (i + 1) * self.cols)]
+            for i in range(self.rows)
+        ]
+
+    def player(self, state):
+        x, o = state
+        return X if x.bit_count() == o.bit_count() else O
+
+    def actions(self, state):
+        """
+        Returns the set of (i, j) cells that are empty.
+        """
+        taken = state[0] | state[1]
+        return {self.action(cell) for cell in range(self.cells)
+                if not taken >> cell & 1}
+
+    def result(self, state, action):
+        x, o = state
+        cell = self.cell(action)
+        if (x | o) >> cell & 1:
+            raise ValueError(f"{action} is not empty")
+        if x.bit_count() == o.bit_count():
+            return (x | 1 << cell, o)
+        return (x, o | 1 << cell)
+
+    def winner(self, state):
+        x, o = state
+        for line in self.lines:
+            if x & line == line:
+                return X
+            if o & line == line:
+                return O
+        return None
+
+    def terminal(self, state):
+        return (self.winner(state) is not None
+                or state[0] | state[1] == self.full)
+
+    def wins(self, mask, cell):
+        """
+        Returns True if `mask` completes a line through `cell`.
+        """
+        for line in self.lines_through[cell]:
+            if mask & line == line:
+                return True
+        return False
+
+    def candidates(self, taken):
+        """
+        Returns the empty cells worth searching, center first.
+        """
+        if self.radius is not None and taken:
+            reachable = 0
+            for cell in range(self.cells):
+                if taken >> cell & 1:
+                    reachable |= self.near[cell]
+            free = reachable & ~taken
+        else:
+            free = self.full & ~taken
+        return [cell for cell in self.order if free >> cell & 1]
+
+
+def line_score(game, x, o):
+    """
+    Default evaluation, from X's point of view: every line still open
+    to one player counts 10 ** (its pieces held) for that player.
+    """
+    score = 0
+    for line in game.lines:
+        mine = x & line
+        theirs = o & line
+        if mine and not theirs:
+            score += 10 ** mine.bit_count()
+        elif theirs and not mine:
+            score -= 10 ** theirs.bit_count()
+    return score
+
+
+class _Timeout(Exception):
+    pass
+
+
+def search(game, state, time_limit=TIME_LIMIT, evaluate=line_score,
+           max_depth=None, cancel=None):
+    """
+    Returns (action, stats): a move for the player to move in `state`,
+    found by iterative deepening within `time_limit` seconds.
+
+    Each pass is an alpha-beta search to one more ply than the last,
+    trying the previous best moves first; the move from the deepest
+    completed pass is returned. Positions at the depth limit are
+    scored by `evaluate(game, x, o)`, from X's point of view. `stats`
+    reports the depth completed, nodes searched, score and seconds.
+
+    `cancel`, a `threading.Event`, ends the search early when set, as
+    if time had run out, so a caller can abandon a search running in
+    another thread.
+    """
+    start = time.perf_counter()
+    deadline = start + time_limit
+    x, o = state
+    if game.terminal(state):
+        return None, {"depth": 0, "nodes": 0, "score": None, "seconds": 0.0}
+    # Win scores depend on the distance from the root, so the table
+    # is only valid for one search
+    table = TranspositionTable()
+    empty = game.cells - (x | o).bit_count()
+    if max_depth is None or max_depth > empty:
+        max_depth = empty
+    sign = 1 if x.bit_count() == o.bit_count() else -1
+
+    counter = [0]
+    best = None
+    score = None
+    depth = 0
+    for limit in range(1, max_depth + 1):
+        try:
+            score, cell = _root(game, x, o, sign, limit, evaluate, table,
+                                deadline, cancel, counter)
+        except _Timeout:
+            break
+        best = cell
+        depth = limit
+        if abs(score) >= WIN - game.cells:
+            # Forced win or loss found; deeper passes cannot change it
+            break
+    if best is None:
+        # Not even one ply finished: take the most central candidate
+        best = game.candidates(x | o)[0]
+    return game.action(best), {
+        "depth": depth,
+        "nodes": counter[0],
+        "score": None if score is None else sign * score,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def _root(game, x, o, sign, depth, evaluate, table, deadline, cancel,
+          counter):
+    """
+    Searches each move from the root to `depth` plies and returns
+    (score for the player to move, best cell).
+    """
+    entry = table.get((x, o))
+    moves = game.candidates(x | o)
+    if entry is not None and entry[3] is not None:
+        moves.remove(entry[3])
+        moves.insert(0, entry[3])
+    alpha = -WIN - 1
+    best = moves[0]
+    for cell in moves:
+        if sign == 1:
+            child = (x | 1 << cell, o)
+        else:
+            child = (x, o | 1 << cell)
+        score = -_negamax(game, *child, -sign, cell, depth - 1, 1,
+                          -WIN - 1, -alpha, evaluate, table, deadline, cancel,
+                          counter)
+        if score > alpha:
+            alpha = score
+            best = cell
+    table.put((x, o), (depth, alpha, EXACT, best))
+    return alpha, best
+
+
+def _negamax(game, x, o, sign, last, depth, ply, alpha, beta, evaluate,
+             table, deadline, cancel, counter):
+    """
+    Alpha-beta search from the point of view of the player to move
+    (`sign` 1 for X, -1 for O), after the other player took `last`.
+    """
+    counter[0] += 1
+    if time.perf_counter() > deadline or (cancel is not None and cancel.is_set()):
+        raise _Timeout
+
+    if game.wins(o if sign == 1 else x, last):
+        return ply - WIN
+    taken = x | o
+    if taken == game.full:
+        return 0
+    if depth == 0:
+        return sign * evaluate(game, x, o)
+
+    entry = table.get((x, o))
+    killer = None
+    if entry is not None:
+        stored_depth, value, kind, killer = entry
+        if stored_depth >= depth:
+            if kind == EXACT:
+                return value
+            if kind == LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                return value
+
+    moves = game.candidates(taken)
+    if killer is not None and killer in moves:
+        moves.remove(killer)
+        moves.insert(0, killer)
+    lowest = alpha
+    value = -WIN - 1
+    best = None
+    for cell in moves:
+        if sign == 1:
+            child = (x | 1 << cell, o)
+        else:
+            child = (x, o | 1 << cell)
+        score = -_negamax(game, *child, -sign, cell, depth - 1, ply + 1,
+                          -beta, -alpha, evaluate, table, deadline, cancel,
+                          counter)
+        if score > value:
+            value = score
+            best = cell
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+    if value <= lowest:
+        kind = UPPER
+    elif value >= beta:
+        kind = LOWER
+    else:
+        kind = EXACT
+    table.put((x, o), (depth, value, kind, best))
+    return value
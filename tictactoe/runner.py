@@ -1,12 +1,20 @@
 import pygame
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import tictactoe as ttt
 
 pygame.init()
 size = width, height = 600, 400
 
+# Frames drawn per second
+FPS = 60
+
+# Least time the computer appears to think before moving, in seconds
+THINK_TIME = 0.5
+
 # Colors
 black = (0, 0, 0)
 white = (255, 255, 255)
@@ -17,15 +25,43 @@ mediumFont = pygame.font.Font("OpenSans-Regular.ttf", 28)
 largeFont = pygame.font.Font("OpenSans-Regular.ttf", 40)
 moveFont = pygame.font.Font("OpenSans-Regular.ttf", 60)
 
+clock = pygame.time.Clock()
+
+
+def think(board, generation, cancel):
+    """
+    Returns (generation, move): the AI's move for `board`, computed in
+    the worker thread, tagged with the game it was asked for. `cancel`
+    is set once that game is abandoned; the move is then None.
+    """
+    if cancel.is_set():
+        return generation, None
+    return generation, ttt.minimax(board)
+
+
+# The AI searches in a background thread so the window keeps drawing;
+# `ai_move` is the pending result, or None when no search is running.
+# Each game has its own `generation` number and `cancel` event, so a
+# restart cancels the old search and its move is ignored.
+executor = ThreadPoolExecutor(max_workers=1)
+ai_move = None
+ai_started = 0
+generation = 0
+cancel = threading.Event()
+
 user = None
 board = ttt.initial_state()
-ai_turn = False
 
 while True:
 
+    restart = False
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
+            cancel.set()
+            executor.shutdown(wait=False, cancel_futures=True)
             sys.exit()
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+            restart = True
 
     screen.fill(black)
 
@@ -102,7 +138,8 @@ while True:
         elif user == player:
             title = f"Play as {user}"
         else:
-            title = f"Computer thinking..."
+            dots = int((time.monotonic() - ai_started) * 3) % 4
+            title = f"Computer thinking{'.' * dots}"
         title = largeFont.render(title, True, white)
         titleRect = title.get_rect()
         titleRect.center = ((width / 2), 30)
@@ -110,13 +147,14 @@ while True:
 
         # Check for AI move
         if user != player and not game_over:
-            if ai_turn:
-                time.sleep(0.5)
-                move = ttt.minimax(board)
-                board = ttt.result(board, move)
-                ai_turn = False
-            else:
-                ai_turn = True
+            if ai_move is None:
+                ai_move = executor.submit(think, board, generation, cancel)
+                ai_started = time.monotonic()
+            elif ai_move.done() and time.monotonic() - ai_started >= THINK_TIME:
+                move_generation, move = ai_move.result()
+                ai_move = None
+                if move_generation == generation and move is not None:
+                    board = ttt.result(board, move)
 
         # Check for a user move
         click, _, _ = pygame.mouse.get_pressed()
@@ -127,20 +165,31 @@ while True:
                     if (board[i][j] == ttt.EMPTY and tiles[i][j].collidepoint(mouse)):
                         board = ttt.result(board, (i, j))
 
-        if game_over:
-            againButton = pygame.Rect(width / 3, height - 65, width / 3, 50)
-            again = mediumFont.render("Play Again", True, black)
-            againRect = again.get_rect()
-            againRect.center = againButton.center
-            pygame.draw.rect(screen, white, againButton)
-            screen.blit(again, againRect)
-            click, _, _ = pygame.mouse.get_pressed()
-            if click == 1:
-                mouse = pygame.mouse.get_pos()
-                if againButton.collidepoint(mouse):
-                    time.sleep(0.2)
-                    user = None
-                    board = ttt.initial_state()
-                    ai_turn = False
+        # Play Again once the game is over, Restart (or Esc) during it
+        againButton = pygame.Rect(width / 3, height - 65, width / 3, 50)
+        again = mediumFont.render(
+            "Play Again" if game_over else "Restart", True, black)
+        againRect = again.get_rect()
+        againRect.center = againButton.center
+        pygame.draw.rect(screen, white, againButton)
+        screen.blit(again, againRect)
+        click, _, _ = pygame.mouse.get_pressed()
+        if click == 1:
+            mouse = pygame.mouse.get_pos()
+            if againButton.collidepoint(mouse):
+                time.sleep(0.2)
+                restart = True
+
+    if restart:
+        # Cancel any search still running for the old game
+        cancel.set()
+        cancel = threading.Event()
+        generation += 1
+        if ai_move is not None:
+            ai_move.cancel()
+            ai_move = None
+        user = None
+        board = ttt.initial_state()
 
     pygame.display.flip()
+    clock.tick(FPS)
@@ -1,9 +1,40 @@
-from math import inf as infinity
+import bitboard
+import book
+from bitboard import COUNT, FREE, FULL, WON, Bitboard
+from transposition import TranspositionTable
 
 X = "X"
 O = "O"
 EMPTY = None
 
+# The (i, j) action for each bit index
+CELLS = tuple(divmod(cell, 3) for cell in range(9))
+
+# Cells in the order the search tries them: center, corners, then edges
+ORDER = (4, 0, 2, 6, 8, 1, 3, 5, 7)
+
+# ORDERED[mask] lists the cells not set in `mask`, in `ORDER`
+ORDERED = tuple(
+    tuple(cell for cell in ORDER if not mask >> cell & 1)
+    for mask in range(FULL + 1)
+)
+
+# Kinds of value stored in `table`: the exact value, or a bound found
+# when the search was cut off
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# (value, kind, best cell) of searched positions, keyed by
+# `bitboard.key` and shared by every call
+table = TranspositionTable()
+
+# Positions expanded (not found in `table`) by the last `minimax` call
+stats = {"nodes": 0}
+
+# Solved positions for `minimax` to look up instead of searching
+book.install()
+
 
 def initial_state():
     """
@@ -18,144 +49,194 @@ def player(board):
     """
     Returns player who has the next turn on a board.
     """
-    x_count = 0
-    o_count = 0
-    for row in board:
-      for col in row:
-        if col == 'X':
-          x_count += 1
-        elif col == 'O':
-            o_count += 1
-    if x_count == o_count:
-        return X
-    else:
-        return O
+    return bitboard.player(bits(board))
 
 
 def actions(board):
     """
     Returns set of all possible actions (i, j) available on the board.
     """
-    actions_set=set()
-    for row in range(3):
-        for col in range(3):
-            if board[row][col] == EMPTY:
-                actions_set.add((row, col))
-    return actions_set
+    return {CELLS[cell] for cell in bitboard.actions(bits(board))}
 
 
 def result(board, action):
     """
     Returns the board that results from making move (i, j) on the board.
-    """
-    row = action
-    col = action
-    new_board = []
-    for row in board:
-      new_row = row[:]
-      new_board.append(new_row)
-    new_board[action[0]][action[1]] = player(board)
+    A `Bitboard` gives a `Bitboard`, and a list board a new list board.
+    """
+    i, j = action
+    if isinstance(board, Bitboard):
+        return bitboard.result(board, 3 * i + j)
+    if board[i][j] != EMPTY:
+        raise ValueError(f"{action} is not empty")
+    new_board = [row[:] for row in board]
+    new_board[i][j] = player(board)
     return new_board
 
 
-
 def winner(board):
     """
     Returns the winner of the game, if there is one.
     """
-    # Check rows
-    if board[0][0] == board[0][1] and board[0][2]==board[0][0] and board[0][2] == board[0][1] :
-            return board[0][0]
-    elif board[1][0] == board[1][1] and board[1][2]==board[1][0] and board[1][1] == board[1][2] :
-      return board[1][0]
-    elif board[2][0] == board[2][1] and board[2][0]==board[2][2] and board[2][2] == board[2][1] :
-      return board[2][0]
-    # Check diagonals
-    elif board[0][0] == board[1][1] == board[2][2] :
-        return board[0][0]
-    elif board[0][2] == board[1][1] == board[2][0]:
-        return board[0][2]
-    # check columns
-    elif board[0][0] == board[1][0] == board[2][0] :
-        return board[0][0]
-    elif board[0][1] == board[1][1] == board[2][1]  :
-        return board[0][1]
-    elif board[0][2] == board[1][2] == board[2][2]  :
-        return board[0][2]
-    # No winner
-    return None
+    return bitboard.winner(bits(board))
 
 
 def terminal(board):
     """
     Returns True if game is over, False otherwise.
     """
-    if winner(board)!=None:
-        return True
-
-    for row in board:
-        if EMPTY in row:
-            return False
-
-    return True
+    return bitboard.terminal(bits(board))
 
 
 def utility(board):
     """
     Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
     """
-    if winner(board) == X:
+    won = winner(board)
+    if won == X:
         return 1
-    elif winner(board) == O:
+    elif won == O:
         return -1
     else:
         return 0
 
 
+def bits(board):
+    """
+    Returns the board as a `Bitboard`, converting a list board.
+    """
+    if isinstance(board, Bitboard):
+        return board
+    return bitboard.from_list(board)
 
 
 def minimax(board):
     """
     Returns the optimal action for the current player on the board.
+
+    The move is looked up in the solved `book` table if one is loaded.
+    Otherwise moves are scored by an alpha-beta search; at the root
+    they are tried in row-major order. Either way ties go to the first
+    optimal move in row-major order.
     """
-    if terminal(board):
+    stats["nodes"] = 0
+    x, o = bits(board)
+    if bitboard.terminal(Bitboard(x, o)):
         return None
-    player_turn = player(board)
-    if player_turn == X:
-        best_score = -infinity 
-        best_move = None
-        for action in actions(board):
-            new_score = (min_value(result(board, action)))
-            if new_score > best_score:
-                best_score = new_score
-                best_move = action
-    else:
-        best_score = infinity 
-        best_move = None
-        for action in actions(board):
-            new_score = max_value(result(board, action))
-            if new_score < best_score:
-                best_score = new_score
-                best_move = action
-
+    solved = book.lookup(x, o)
+    if solved is not None:
+        moves = solved[1]
+        return CELLS[(moves & -moves).bit_length() - 1]
+    best_move = None
+    best_score = None
+    alpha = -1
+    beta = 1
+    for cell in FREE[x | o]:
+        if COUNT[x] == COUNT[o]:
+            new_score = _search(x | 1 << cell, o, alpha, beta)
+            better = best_score is None or new_score > best_score
+        else:
+            new_score = _search(x, o | 1 << cell, alpha, beta)
+            better = best_score is None or new_score < best_score
+        if better:
+            best_score = new_score
+            best_move = CELLS[cell]
+            if COUNT[x] == COUNT[o]:
+                alpha = max(alpha, new_score)
+            else:
+                beta = min(beta, new_score)
+            if alpha >= beta:
+                break
     return best_move
 
-def max_value(board):
-    if terminal(board):
-        return utility(board)
 
-    v =-infinity
-    for action in actions(board):
-        v = max(v, min_value(result(board, action)))
-    return v
+def value(board):
+    """
+    Returns the minimax value of the board: 1 if X wins with best play,
+    -1 if O does, 0 for a tie.
+    """
+    x, o = bits(board)
+    solved = book.lookup(x, o)
+    if solved is not None:
+        return solved[0]
+    return _search(x, o, -1, 1)
 
 
-def min_value(board):
-    if terminal(board):
-        return utility(board)
+def _search(x, o, alpha, beta):
+    """
+    Alpha-beta search of the position with X on mask `x` and O on mask
+    `o`. Returns its exact value if that lies between `alpha` and
+    `beta`; otherwise a bound on the same side of the window.
+
+    Children are tried center first, then corners, then edges, after
+    the best move found by any earlier search of the position, and
+    results are kept in `table` so transpositions are searched once.
+    """
+    k = x | o << 9
+    entry = table.get(k)
+    killer = None
+    if entry is not None:
+        v, kind, killer = entry
+        if kind == EXACT:
+            return v
+        if kind == LOWER:
+            alpha = max(alpha, v)
+        else:
+            beta = min(beta, v)
+        if alpha >= beta:
+            return v
+    stats["nodes"] += 1
+
+    if WON[x]:
+        table.put(k, (1, EXACT, None))
+        return 1
+    if WON[o]:
+        table.put(k, (-1, EXACT, None))
+        return -1
+    if x | o == FULL:
+        table.put(k, (0, EXACT, None))
+        return 0
 
-    v = infinity
-    for action in actions(board):
-        v = min(v, max_value(result(board, action)))
+    moves = ORDERED[x | o]
+    if killer is not None:
+        moves = (killer,) + tuple(cell for cell in moves if cell != killer)
+    lowest = alpha
+    highest = beta
+    best = None
+    if COUNT[x] == COUNT[o]:
+        v = -1
+        for cell in moves:
+            score = _search(x | 1 << cell, o, alpha, beta)
+            if best is None or score > v:
+                v = score
+                best = cell
+                alpha = max(alpha, v)
+                if alpha >= beta:
+                    break
+    else:
+        v = 1
+        for cell in moves:
+            score = _search(x, o | 1 << cell, alpha, beta)
+            if best is None or score < v:
+                v = score
+                best = cell
+                beta = min(beta, v)
+                if alpha >= beta:
+                    break
+
+    # Values never leave [-1, 1], so a bound at either end is exact
+    if -1 < v <= lowest:
+        kind = UPPER
+    elif highest <= v < 1:
+        kind = LOWER
+    else:
+        kind = EXACT
+    table.put(k, (v, kind, best))
     return v
 
+
+def key(board):
+    """
+    Returns the board's transposition table key.
+    """
+    return bitboard.key(bits(board))
@@ -0,0 +1,58 @@
+from collections import OrderedDict
+
+# Default number of positions kept; 3x3 tic-tac-toe has 5478 legal ones
+SIZE = 2**16
+
+
+class TranspositionTable():
+    """
+    Least-recently-used table of searched positions, keyed by board
+    encoding, bounded to `size` entries.
+    """
+
+    def __init__(self, size=SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Returns the entry stored for `key`, or None.
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        """
+        Store `entry` for `key`, evicting the least recently used entry
+        if the table is full.
+        """
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        """
+        Returns a dictionary of hit/miss counters and current usage.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "size": self.size,
+        }